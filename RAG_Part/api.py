@@ -76,20 +76,25 @@ def expand_query(query):
     
     return query
 
+# Actor ID patterns (prioritize specific IDs), compiled once at import and checked in order,
+# first match wins. Kept identical in api.py and RagAPP.py so both answer the same way.
+ACTOR_ID_PATTERNS = {
+    actor_type: [re.compile(pattern) for pattern in pattern_list]
+    for actor_type, pattern_list in {
+        'patient': [r'patient\s*(\d+)', r'patient\s+id\s*(\d+)', r'patient\s+number\s*(\d+)'],
+        'provider': [r'provider\s*(\d+)', r'provider\s+id\s*(\d+)', r'doctor\s*(\d+)', r'physician\s*(\d+)'],
+        'organization': [r'organization\s*(\d+)', r'org\s*(\d+)', r'hospital\s*(\d+)', r'facility\s*(\d+)'],
+        'payer': [r'payer\s*(\d+)', r'insurance\s*(\d+)']
+    }.items()
+}
+
 def detect_query_actor(query):
     """Detect which actor and what information is being requested"""
     query_lower = query.lower()
     
-    patterns = {
-        'patient': [r'patient\s*(\d+)', r'patient\s+id\s*(\d+)'],
-        'provider': [r'provider\s*(\d+)', r'doctor\s*(\d+)', r'physician\s*(\d+)'],
-        'organization': [r'organization\s*(\d+)', r'org\s*(\d+)', r'hospital\s*(\d+)'],
-        'payer': [r'payer\s*(\d+)', r'insurance\s*(\d+)']
-    }
-    
-    for actor_type, pattern_list in patterns.items():
+    for actor_type, pattern_list in ACTOR_ID_PATTERNS.items():
         for pattern in pattern_list:
-            match = re.search(pattern, query_lower)
+            match = pattern.search(query_lower)
             if match:
                 return actor_type, normalize_id(match.group(1))
     
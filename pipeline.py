@@ -2,6 +2,7 @@ import subprocess
 import sys
 import time
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 def run_command(command, description):
     """
@@ -39,6 +40,23 @@ def run_command(command, description):
         print("\n🛑 Pipeline stopped by user.")
         return False
 
+def run_parallel_commands(steps, description):
+    """
+    Runs independent steps at the same time (each in its own process) and waits for all of them.
+    """
+    print("\n" + "="*70)
+    print(f"🚀 STARTING IN PARALLEL: {description}")
+    print("="*70)
+
+    start_time = time.time()
+
+    with ThreadPoolExecutor(max_workers=len(steps)) as executor:
+        results = list(executor.map(lambda step: run_command(step["cmd"], step["desc"]), steps))
+
+    elapsed = time.time() - start_time
+    print(f"\n⏱️  {description}: {sum(results)}/{len(steps)} succeeded in {elapsed:.2f} seconds")
+    return all(results)
+
 def main():
     print(f"""
     *************************************************
@@ -54,6 +72,14 @@ def main():
     
     # --- CONFIGURATION OF STEPS ---
     # Update the paths below if you move other files into the 'scripts' folder
+    # SQL batches generated by earlier extraction runs (rows 0-1499). Rows 1500-1999 are
+    # extracted by step 02 and loaded straight from its JSON Lines output by step 03.
+    SQL_BATCHES = [
+        r"SQL\insert_data_v1.sql",
+        r"SQL\insert_data_v2.sql",
+        r"SQL\insert_data_v3.sql",
+    ]
+
     pipeline_steps = [
         {
             "cmd": [py, r"scripts\01_pretreatement_data.py"],
@@ -64,24 +90,24 @@ def main():
             "desc": "Extraction Unstructured Data Whit LLM" 
         },
         {
-            "cmd": [py, r"scripts\03_parse_json_to_sql.py"],
-            "desc": "Generate SQL Insert Statements from Unstructured CSV Data"
-        },
-        {
-            "cmd": [py, r"scripts\04_parse_sql.py", r"SQL\insert_data_v1.sql"],
-            "desc": "Parsing & Executing SQL Batch 1"
-        },
-        {
-            "cmd": [py, r"scripts\04_parse_sql.py", r"SQL\insert_data_v2.sql"],
-            "desc": "Parsing & Executing SQL Batch 2"
+            "cmd": [py, r"scripts\03_parse_json_to_sql.py", "--load"],
+            "desc": "Load Extracted Records into MySQL (no intermediate SQL file)"
         },
         {
-            "cmd": [py, r"scripts\04_parse_sql.py", r"SQL\insert_data_v3.sql"],
-            "desc": "Parsing & Executing SQL Batch 3"
+            # Shared dim_date rows are committed first so the batches below don't lock each other
+            "cmd": [py, r"scripts\04_parse_sql.py", "--seed-dates", *SQL_BATCHES],
+            "desc": "Seeding Dates Referenced by the SQL Batches"
         },
         {
-            "cmd": [py, r"scripts\04_parse_sql.py", r"SQL\insert_data_v4.sql"],
-            "desc": "Parsing & Executing SQL Batch 4"
+            # The batches are independent: each one runs on its own connection, at the same time
+            "parallel": [
+                {
+                    "cmd": [py, r"scripts\04_parse_sql.py", sql_file],
+                    "desc": f"Parsing & Executing SQL Batch {batch_number}"
+                }
+                for batch_number, sql_file in enumerate(SQL_BATCHES, 1)
+            ],
+            "desc": f"Parsing & Executing SQL Batches 1-{len(SQL_BATCHES)}"
         },
         {
             "cmd": [py, r"scripts\05_load_synthea_csv.py"],
@@ -101,7 +127,10 @@ def main():
     success_count = 0
 
     for step in pipeline_steps:
-        success = run_command(step["cmd"], step["desc"])
+        if "parallel" in step:
+            success = run_parallel_commands(step["parallel"], step["desc"])
+        else:
+            success = run_command(step["cmd"], step["desc"])
         if not success:
             print("\n⚠️  Pipeline terminated prematurely due to error.")
             sys.exit(1)
@@ -2,21 +2,32 @@ import pandas as pd
 import re
 
 
+# Whitespace, commas, colons and hyphens all collapse to a single space (one pass)
+SEPARATORS_RE = re.compile(r'[\s,:\-]+')
+
+
 def preprocess_text(text):
     if pd.isna(text):
         return ""
     
     text = str(text).lower() 
     
-    text = re.sub(r'[\s,:]+', ' ', text)
-    
-    text = re.sub(r'[\r\n\t\-]+', ' ', text)
-    
-    text = re.sub(r'\s+', ' ', text).strip()
+    text = SEPARATORS_RE.sub(' ', text).strip()
     
     return text
 
 
+def preprocess_column(texts):
+    """Same cleaning as preprocess_text, applied to a whole pandas column at once"""
+    return (
+        texts.fillna("")
+        .astype(str)
+        .str.lower()
+        .str.replace(SEPARATORS_RE, ' ', regex=True)
+        .str.strip()
+    )
+
+
 if __name__ == "__main__" :
     dataset = pd.read_csv("data/mtsamples.csv")
-    dataset['clean_transcription'] = dataset['transcription'].apply(preprocess_text)
\ No newline at end of file
+    dataset['clean_transcription'] = preprocess_column(dataset['transcription'])
\ No newline at end of file
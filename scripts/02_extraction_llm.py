@@ -1,20 +1,32 @@
 import time
+import asyncio
+import hashlib
 import pandas as pd
 import json
 import os
+import sys
 from google import genai
 from google.genai import types
 from dotenv import load_dotenv
-import importlib
+from pathlib import Path
 
-extraction_and_preprocessing = importlib.import_module("01_pretreatement_data")
+# Optionnel : orjson (parseur/sérialiseur en C) s'il est installé, sinon le module json standard
+try:
+    import orjson
+    def json_loads(text): return orjson.loads(text)
+    def json_dumps(data): return orjson.dumps(data).decode("utf-8")
+except ImportError:
+    json_loads = json.loads
+    json_dumps = json.dumps
 
 # 1. Configuration
 load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 client = genai.Client(api_key=os.getenv("API_KEY"))
 
-exctraction_json_output = {}
+# Sortie JSON Lines : une ligne {"<id ligne source>": extraction} ajoutée dès qu'une ligne est extraite,
+# ce qui permet de reprendre un run interrompu sans rien perdre
+OUTPUT_FILE = "output_3.jsonl"
 
 # 2. Définition du Schéma Cible (Aligné sur texas_star_schema.sql)
 target_schema = """
@@ -70,15 +82,8 @@ target_schema = """
   ]
 }
 """
-def llm_extraction(dataset):
-  count = 1500
-  # 3. Boucle d'Extraction
-  for idx in range(1500, 2000): # Limité à 5 pour le test
-      
-      # Construction du contexte à partir de la ligne du CSV
-      row_context = "\n".join([f'{col}: {str(dataset[col].iloc[idx])}' for col in dataset.columns])
-      
-      prompt = f"""
+# 3. Prompt d'extraction (construit une seule fois, seule la transcription change par ligne)
+EXTRACTION_PROMPT = f"""
       You are a medical data engineer. 
       
       **GOAL:** Extract data from the transcription. Since the source data is anonymized, you must **IMPUTE (GENERATE)** realistic synthetic data for missing demographics to populate a Texas Hospital Data Warehouse.
@@ -104,48 +109,356 @@ def llm_extraction(dataset):
       5. **fact_patient_events:** DO NOT INVENT MEDICAL DATA. 
         - Only extract diagnoses, medications, labs, and vitals that are **actually present** in the text below.
         - If the text says "Weight 130", extract 130. Do not invent a weight if not listed.
+"""
+
+# Le prompt d'extraction est figé et passe en system_instruction : préfixe identique d'un appel
+# à l'autre (réutilisable par le cache implicite de Gemini), seul le message utilisateur varie.
 
+# Message pour une seule transcription
+SINGLE_ROW_PROMPT = """
       **TRANSCRIPTION:**
-      {row_context}
-      """
+"""
+
+# Micro-batching : plusieurs transcriptions envoyées dans un seul appel Gemini
+ROWS_PER_CALL = 4
+
+MULTI_ROW_PROMPT = """
+      **MULTIPLE TRANSCRIPTIONS:**
+      Each transcription below starts with a line "---TRANSCRIPTION id=<id>---".
+      Return a JSON ARRAY with exactly one object per transcription, in the same order.
+      Each object follows the STRICT OUTPUT FORMAT and adds a "row_id" field holding the transcription id.
+
+"""
+
+# Empreinte du prompt : change dès que les règles ou le schéma sont modifiés
+PROMPT_VERSION = hashlib.sha256(EXTRACTION_PROMPT.encode("utf-8")).hexdigest()[:12]
+
+# Colonnes jamais envoyées au LLM : l'index exporté du CSV, et clean_transcription si le CSV
+# la contient — la transcription brute (non altérée par le prétraitement) part une seule fois
+CONTEXT_EXCLUDED_COLUMNS = {"Unnamed: 0", "clean_transcription"}
+
+def build_row_context(dataset, idx):
+  # Construction du contexte à partir de la ligne du CSV (une seule lecture de la ligne)
+  return "\n".join(
+      f'{col}: {value}' for col, value in dataset.iloc[idx].items()
+      if col not in CONTEXT_EXCLUDED_COLUMNS
+  )
+
+# Configuration Gemini partagée par tous les appels
+GEMINI_MODEL = "gemini-2.5-flash-lite" # Modèle rapide et efficace
+
+# Schéma de sortie imposé à Gemini (décodage contraint) : même structure que target_schema
+def _text(nullable=True):
+  return {"type": "STRING", "nullable": nullable}
+
+def _number():
+  return {"type": "NUMBER", "nullable": True}
+
+RECORD_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "dim_patient": {
+            "type": "OBJECT",
+            "properties": {
+                "full_name": _text(), "gender": _text(), "birthdate": _text(),
+                "city": _text(), "state": _text(), "zip": _text()
+            }
+        },
+        "dim_provider": {
+            "type": "OBJECT",
+            "properties": {"name": _text(), "specialty": _text()}
+        },
+        "dim_organization": {
+            "type": "OBJECT",
+            "properties": {"name": _text(), "city": _text(), "state": _text()}
+        },
+        "dim_payer": {
+            "type": "OBJECT",
+            "properties": {"name": _text()}
+        },
+        "fact_patient_events": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "event_category": _text(nullable=False), "event_date": _text(),
+                    "code": _text(), "description": _text(),
+                    "numeric_value": _number(), "units": _text(), "cost": _number()
+                },
+                "required": ["event_category"]
+            }
+        }
+    },
+    "required": ["dim_patient", "dim_provider", "dim_organization", "dim_payer", "fact_patient_events"]
+}
+
+# Variante micro-batch : un tableau d'enregistrements portant chacun son row_id
+BATCH_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        **RECORD_SCHEMA,
+        "properties": {"row_id": {"type": "INTEGER"}, **RECORD_SCHEMA["properties"]},
+        "required": ["row_id", *RECORD_SCHEMA["required"]]
+    }
+}
+
+MAX_OUTPUT_TOKENS_PER_ROW = 2048 # Un enregistrement JSON complet tient largement dans ce budget
+GENERATION_CONFIG = types.GenerateContentConfig(
+    system_instruction=EXTRACTION_PROMPT, # Consignes statiques, en préfixe de chaque appel
+    response_mime_type="application/json", # Force le format JSON
+    response_schema=RECORD_SCHEMA, # Structure garantie, plus de JSON approximatif
+    temperature=0.0, # Zéro créativité pour une extraction fidèle
+    thinking_config=types.ThinkingConfig(thinking_budget=0), # Pas de raisonnement pour une simple extraction
+    max_output_tokens=MAX_OUTPUT_TOKENS_PER_ROW # Borne le coût et la latence d'une réponse
+)
+BATCH_GENERATION_CONFIG = GENERATION_CONFIG.model_copy(update={
+    "response_schema": BATCH_SCHEMA,
+    "max_output_tokens": MAX_OUTPUT_TOKENS_PER_ROW * ROWS_PER_CALL
+})
+MAX_JSON_RETRIES = 2 # Relances avec retour d'erreur si le JSON est invalide
+
+# Concurrence : plusieurs appels Gemini en vol, bornés et espacés pour respecter les quotas
+MAX_CONCURRENT_CALLS = 8
+REQUESTS_PER_MINUTE = 30
+
+class ApiThrottle:
+  """Limite le nombre d'appels simultanés et espace leurs départs (REQUESTS_PER_MINUTE)."""
+
+  def __init__(self, max_concurrent, requests_per_minute):
+      self.semaphore = asyncio.Semaphore(max_concurrent)
+      self.interval = 60.0 / requests_per_minute
+      self.lock = asyncio.Lock()
+      self.next_slot = 0.0
+
+  async def wait_for_slot(self):
+      async with self.lock:
+          now = time.monotonic()
+          delay = self.next_slot - now
+          self.next_slot = max(now, self.next_slot) + self.interval
+      if delay > 0:
+          await asyncio.sleep(delay)
 
+async def call_gemini(prompt, throttle, config=GENERATION_CONFIG):
+  """
+  Envoie le prompt et renvoie le JSON parsé.
+  En cas de JSON invalide, l'erreur est renvoyée au modèle dans la même conversation
+  pour qu'il corrige sa réponse (au plus MAX_JSON_RETRIES fois).
+  """
+  chat = client.aio.chats.create(model=GEMINI_MODEL, config=config)
+  message = prompt
+  for attempt in range(MAX_JSON_RETRIES + 1):
+      async with throttle.semaphore:
+          await throttle.wait_for_slot()
+          response = await chat.send_message(message)
       try:
-          response = client.models.generate_content(
-              model="gemini-2.5-flash-lite", # Modèle rapide et efficace
-              contents=prompt,
-              config=types.GenerateContentConfig(
-                  response_mime_type="application/json", # Force le format JSON
-                  temperature=0.0 # Zéro créativité pour une extraction fidèle
-              )
-          )
-          
-          # Parsing et ajout des métadonnées
-          data = json.loads(response.text)
-          
-          # On ajoute des métadonnées techniques pour le traçage (utile pour validation_queue)
-          data['metadata'] = {
-              'source_row_id': idx,
-              'sample_name': str(dataset['sample_name'].iloc[idx])
-          }
-          
-          
-          print(f"✅ Row {idx} extracted.")
-          exctraction_json_output[str(count)] = data
-          print(data)
-          count = count + 1
-          if count % 5 == 0:
-              print("⏳ Pausing briefly to respect API limits...")
-              time.sleep(10)
+          return json_loads(response.text or "")
+      except json.JSONDecodeError as e:
+          if attempt == MAX_JSON_RETRIES:
+              raise
+          print(f"🔁 Invalid JSON ({e}), asking Gemini to fix it (retry {attempt + 1}/{MAX_JSON_RETRIES})...")
+          message = f"Your previous output had this error: {e}. Return valid JSON only."
+          await asyncio.sleep(1.0 * (attempt + 1))
 
+# Cache des extractions : clé = sha256(modèle + version du prompt + contexte de la ligne)
+# Sur disque uniquement, pour survivre d'un run à l'autre : chaque ligne n'est lue qu'une
+# fois par run, un niveau en mémoire ne servirait jamais
+CACHE_DIR = Path(".extract_cache")
+
+def get_cache_key(row_context):
+  return hashlib.sha256(f"{GEMINI_MODEL}|{PROMPT_VERSION}|{row_context}".encode("utf-8")).hexdigest()
+
+def load_cached_extraction(row_context):
+  cache_path = CACHE_DIR / f"{get_cache_key(row_context)}.json"
+  if not cache_path.exists():
+      return None
+  try:
+      with open(cache_path, "r", encoding="utf-8") as f:
+          return json_loads(f.read())
+  except (OSError, json.JSONDecodeError):
+      return None # Entrée corrompue : on ré-extrait
+
+def store_cached_extraction(row_context, data):
+  CACHE_DIR.mkdir(exist_ok=True)
+  key = get_cache_key(row_context)
+  payload = json_dumps(data)
+  cache_path = CACHE_DIR / f"{key}.json"
+  # Écriture atomique : un arrêt brutal ne laisse jamais de fichier à moitié écrit
+  tmp_path = cache_path.with_suffix(".tmp")
+  with open(tmp_path, "w", encoding="utf-8") as f:
+      f.write(payload)
+  os.replace(tmp_path, cache_path)
+
+async def extract_single_row(idx, row_context, throttle):
+  try:
+      return idx, await call_gemini(SINGLE_ROW_PROMPT + row_context, throttle)
+  except Exception as e:
+      print(f"❌ Error row {idx}: {e}")
+      return idx, None
+
+async def extract_row_batch(row_contexts, throttle):
+  """
+  Extrait plusieurs lignes ({idx: contexte}) en un seul appel Gemini.
+  Si la réponse groupée est inexploitable, on retombe sur un appel par ligne.
+  """
+  indices = list(row_contexts)
+  if len(indices) > 1:
+      blocks = "\n".join(
+          f"---TRANSCRIPTION id={idx}---\n{row_context}" for idx, row_context in row_contexts.items()
+      )
+      try:
+          records = await call_gemini(MULTI_ROW_PROMPT + blocks, throttle, BATCH_GENERATION_CONFIG)
+          results = {int(record.pop('row_id')): record for record in records}
+          if sorted(results) == sorted(indices):
+              return results
+          print(f"⚠️ Rows {indices[0]}-{indices[-1]}: incomplete batch answer, retrying row by row.")
       except Exception as e:
+          print(f"⚠️ Rows {indices[0]}-{indices[-1]}: batch call failed ({e}), retrying row by row.")
+
+  answers = await asyncio.gather(
+      *(extract_single_row(idx, row_context, throttle) for idx, row_context in row_contexts.items())
+  )
+  return {idx: data for idx, data in answers if data is not None}
+
+def load_done_rows(output_path):
+  """Lignes source déjà présentes dans la sortie JSONL (une dernière ligne tronquée est ignorée)."""
+  done = set()
+  if not os.path.exists(output_path):
+      return done
+  with open(output_path, "r", encoding="utf-8") as f:
+      for line in f:
+          try:
+              done.update(int(row_id) for row_id in json_loads(line))
+          except (json.JSONDecodeError, ValueError):
+              continue
+  return done
+
+def write_record(out, dataset, idx, data, from_cache):
+  # On ajoute des métadonnées techniques pour le traçage (utile pour validation_queue)
+  data['metadata'] = {
+      'source_row_id': idx,
+      'sample_name': str(dataset['sample_name'].iloc[idx])
+  }
+  out.write(json_dumps({str(idx): data}) + "\n")
+  out.flush()
+  print(f"✅ Row {idx} extracted{' (cache)' if from_cache else ''}.")
+
+async def process_batch(dataset, batch, throttle, out):
+  """Résout un paquet de lignes (cache disque d'abord, Gemini pour le reste) et l'écrit dans la sortie."""
+  row_contexts = {idx: build_row_context(dataset, idx) for idx in batch}
+
+  # Les lignes déjà extraites lors d'un run précédent ne repartent pas chez Gemini
+  results = {}
+  for idx, row_context in row_contexts.items():
+      cached = load_cached_extraction(row_context)
+      if cached is not None:
+          results[idx] = cached
+  pending = {idx: ctx for idx, ctx in row_contexts.items() if idx not in results}
+
+  if pending:
+      for idx, data in (await extract_row_batch(pending, throttle)).items():
+          store_cached_extraction(pending[idx], data)
+          results[idx] = data
+
+  for idx in batch:
+      if idx in results:
+          write_record(out, dataset, idx, results[idx], from_cache=idx not in pending)
+  return len(results)
+
+async def extract_all_batches(dataset, batches, out):
+  throttle = ApiThrottle(MAX_CONCURRENT_CALLS, REQUESTS_PER_MINUTE)
+  return sum(await asyncio.gather(*(process_batch(dataset, batch, throttle, out) for batch in batches)))
+
+# Mode Batch API : tout le travail hors-ligne dans un seul job Gemini (coût réduit de moitié,
+# résultats en différé). Une requête par ligne pour retrouver chaque réponse par sa position.
+BATCH_POLL_SECONDS = 30
+BATCH_DONE_STATES = {"JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+
+def extract_with_batch_api(row_contexts):
+  """Soumet {idx: contexte} comme un job Gemini Batch, attend sa fin et renvoie {idx: données}."""
+  indices = list(row_contexts)
+  inlined_requests = [
+      {
+          'contents': [{'role': 'user', 'parts': [{'text': SINGLE_ROW_PROMPT + row_context}]}],
+          'config': GENERATION_CONFIG
+      }
+      for row_context in row_contexts.values()
+  ]
+  job = client.batches.create(
+      model=GEMINI_MODEL,
+      src=inlined_requests,
+      config={'display_name': f"extraction-{indices[0]}-{indices[-1]}"}
+  )
+  print(f"📦 Batch job {job.name} submitted ({len(indices)} rows).")
+
+  while job.state.name not in BATCH_DONE_STATES:
+      time.sleep(BATCH_POLL_SECONDS)
+      job = client.batches.get(name=job.name)
+      print(f"⏳ Batch job {job.name}: {job.state.name}")
+
+  if job.state.name != "JOB_STATE_SUCCEEDED":
+      print(f"❌ Batch job {job.name} ended with {job.state.name}")
+      return {}
+
+  results = {}
+  for idx, inlined_response in zip(indices, job.dest.inlined_responses):
+      if inlined_response.error:
+          print(f"❌ Error row {idx}: {inlined_response.error}")
+          continue
+      try:
+          results[idx] = json_loads(inlined_response.response.text or "")
+      except json.JSONDecodeError as e:
           print(f"❌ Error row {idx}: {e}")
-  print(exctraction_json_output)
-          
-  with open("output_3.json", "w", encoding="utf-8") as f:
-      json.dump(exctraction_json_output, f, indent=4)
+  return results
+
+def llm_extraction(dataset, use_batch_api=False):
+  # Fail-fast : une ligne sans transcription ne vaut pas un appel LLM
+  has_transcription = dataset['transcription'].fillna('').astype(str).str.strip().ne('')
+  row_indices = [idx for idx in range(1500, 2000) if has_transcription.iloc[idx]]
+  skipped = 500 - len(row_indices)
+  if skipped:
+      print(f"⏭️ Skipping {skipped} rows with an empty transcription.")
+
+  # Reprise : les lignes déjà écrites lors d'un run précédent ne sont pas refaites
+  done_rows = load_done_rows(OUTPUT_FILE)
+  if done_rows:
+      row_indices = [idx for idx in row_indices if idx not in done_rows]
+      print(f"⏭️ Resuming: {len(done_rows)} rows already in {OUTPUT_FILE}.")
+
+  # Un arrêt brutal peut laisser une ligne incomplète : la suite repart sur une nouvelle ligne
+  if os.path.exists(OUTPUT_FILE) and os.path.getsize(OUTPUT_FILE) > 0:
+      with open(OUTPUT_FILE, "rb+") as f:
+          f.seek(-1, os.SEEK_END)
+          if f.read(1) != b"\n":
+              f.write(b"\n")
+
+  with open(OUTPUT_FILE, "a", encoding="utf-8") as out:
+      if use_batch_api:
+          # 4. Extraction différée via un job Gemini Batch (seules les lignes absentes du cache partent)
+          results, pending = {}, {}
+          for idx in row_indices:
+              row_context = build_row_context(dataset, idx)
+              cached = load_cached_extraction(row_context)
+              if cached is not None:
+                  results[idx] = cached
+              else:
+                  pending[idx] = row_context
+          if pending:
+              for idx, data in extract_with_batch_api(pending).items():
+                  store_cached_extraction(pending[idx], data)
+                  results[idx] = data
+          for idx in row_indices:
+              if idx in results:
+                  write_record(out, dataset, idx, results[idx], from_cache=idx not in pending)
+          written = len(results)
+      else:
+          # 4. Extraction concurrente (par paquets de ROWS_PER_CALL lignes), chaque paquet écrit dès qu'il est prêt
+          batches = [row_indices[start:start + ROWS_PER_CALL] for start in range(0, len(row_indices), ROWS_PER_CALL)]
+          written = asyncio.run(extract_all_batches(dataset, batches, out))
+
+  print(f"💾 {written} records appended to {OUTPUT_FILE}")
       
       
 if __name__ == "__main__" :
   dataset = pd.read_csv("data/mtsamples.csv")
-  dataset['clean_transcription'] = dataset['transcription'].apply(extraction_and_preprocessing.preprocess_text)
-  llm_extraction(dataset)
\ No newline at end of file
+  # --batch : passe par l'API Batch de Gemini (moins cher, mais résultats en différé)
+  llm_extraction(dataset, use_batch_api='--batch' in sys.argv[1:])
\ No newline at end of file
@@ -1,10 +1,57 @@
 import json
 import os
+import sys
+from datetime import date
+import mysql.connector
+from dotenv import load_dotenv
+
+# Optional: use orjson (C parser) when installed, fallback to the standard json module
+try:
+    import orjson
+    def json_loads(text): return orjson.loads(text)
+except ImportError:
+    json_loads = json.loads
 
 # Configuration
-INPUT_FILE = "output.json"
+load_dotenv()
+
+INPUT_FILE = "output_3.jsonl" # JSON Lines from 02_extraction_llm.py (a plain .json dict also works)
 OUTPUT_FILE = "output.sql"
 
+# Direct load (--load): same DB settings as the other loaders
+DB_CONFIG = {
+    'host': os.getenv("DB_HOST"),
+    'user': os.getenv("DB_USER"),
+    'password': os.getenv("DB_PASS"),
+    'database': os.getenv("DB_NAME")
+}
+LOAD_BATCH_RECORDS = 500  # Records between two date/fact flushes
+DECIMAL_10_2_LIMIT = 10 ** 8  # numeric_value / cost are DECIMAL(10,2): |x| <= 99999999.99
+
+DIMENSIONS = (
+    ("dim_patient", ("full_name", "gender", "birthdate", "city", "state", "zip")),
+    ("dim_provider", ("name", "specialty")),
+    ("dim_organization", ("name", "city", "state")),
+    ("dim_payer", ("name",)),
+)
+# Generated SQL: first AUTO_INCREMENT key of each dimension's file-wide INSERT
+DIMENSION_KEY_VARS = {
+    "dim_patient": "@pat_base", "dim_provider": "@prov_base",
+    "dim_organization": "@org_base", "dim_payer": "@payer_base",
+}
+DIM_INSERT_SQL = {
+    table: f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(['%s'] * len(cols))})"
+    for table, cols in DIMENSIONS
+}
+# ON DUPLICATE KEY (not INSERT IGNORE) so executemany still sends a single multi-row statement
+DATE_INSERT_SQL = "INSERT INTO dim_date (date_key) VALUES (%s) ON DUPLICATE KEY UPDATE date_key = date_key"
+FACT_EVENT_FIELDS = ("event_date", "event_category", "encounter_id", "code", "description", "numeric_value", "units", "cost")
+FACT_INSERT_SQL = (
+    "INSERT INTO fact_patient_events "
+    "(patient_key, provider_key, org_key, payer_key, date_key, event_category, encounter_id, code, description, numeric_value, units, cost) "
+    f"VALUES ({', '.join(['%s'] * 12)})"
+)
+
 def format_sql_value(val):
     """
     Helper to format Python values into SQL strings.
@@ -22,21 +69,78 @@ def format_sql_value(val):
         return f"'{safe_val}'"
     return str(val)
 
+def normalize_date(val):
+    """
+    Returns the date as 'YYYY-MM-DD', or None when the LLM output is not a date
+    (a single bad value would otherwise fail the whole date/fact batch).
+    """
+    if not isinstance(val, str):
+        return None
+    try:
+        return date.fromisoformat(val[:10]).isoformat()
+    except ValueError:
+        return None
+
+def normalize_decimal(val):
+    """
+    Returns the value as a number that fits DECIMAL(10,2), or None when the LLM output
+    is not a finite number in range (MySQL would reject the whole batch).
+    """
+    if isinstance(val, bool):
+        return None
+    try:
+        number = round(float(val), 2)
+    except (TypeError, ValueError):
+        return None
+    return number if abs(number) < DECIMAL_10_2_LIMIT else None
+
+# LLM-filled columns whose bad values are stored as NULL instead of failing the load
+FIELD_NORMALIZERS = {
+    "birthdate": normalize_date,
+    "event_date": normalize_date,
+    "numeric_value": normalize_decimal,
+    "cost": normalize_decimal,
+}
+
+def clean_field(values, field):
+    """values[field] from an LLM record, passed through its FIELD_NORMALIZERS entry if any"""
+    val = values.get(field)
+    normalize = FIELD_NORMALIZERS.get(field)
+    return normalize(val) if normalize else val
+
+def iter_records(input_file):
+    """
+    Yields (row_id, record) pairs from the extraction output.
+    .jsonl -> one {"row_id": record} object per line, read line by line
+    .json  -> a single {"row_id": record, ...} object
+    """
+    with open(input_file, "r", encoding="utf-8") as f:
+        if input_file.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield from json_loads(line).items()
+        else:
+            yield from json_loads(f.read()).items()
+
 def generate_sql_script():
     # 1. Check if input file exists
     if not os.path.exists(INPUT_FILE):
         print(f"❌ Error: {INPUT_FILE} not found. Please place your JSON file in the same directory.")
         return
 
-    # 2. Load JSON
+    # 2. Stream the JSON records straight into the SQL file
+    print(f"🔄 Processing records from {INPUT_FILE}...")
     try:
-        with open(INPUT_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        record_count = write_sql_file(iter_records(INPUT_FILE))
     except json.JSONDecodeError as e:
         print(f"❌ Error decoding JSON: {e}")
         return
 
-    print(f"🔄 Processing {len(data)} records from {INPUT_FILE}...")
+    print(f"✅ Successfully generated: {OUTPUT_FILE} ({record_count} records)")
+
+def write_sql_file(records):
+    # The dimensions are written for the whole file before any fact, so the records are kept
+    records = list(records)
 
     # 3. Open Output File
     with open(OUTPUT_FILE, "w", encoding="utf-8") as sql_file:
@@ -48,77 +152,133 @@ def generate_sql_script():
         sql_file.write("-- ==================================================\n\n")
         sql_file.write("USE hospital_analytics_texas;\n\n")
 
-        # 4. Iterate through every record in the JSON
-        for row_id, record in data.items():
+        # 4. DIMENSIONS: one multi-row INSERT per table for the whole file
+        # A multi-row INSERT with a known row count gets consecutive AUTO_INCREMENT keys
+        # starting at LAST_INSERT_ID(), so record n's key is @base + n * @step: one SET per
+        # table instead of one per record, and still safe when several files load at once.
+        # INSERT IGNORE stores a bad value (too long, bad date) as a warning instead of
+        # failing the statement, so no row is dropped and the key arithmetic holds.
+        if records:
+            sql_file.write("SET @step = @@auto_increment_increment;\n")
+            for table, cols in DIMENSIONS:
+                rows = ", ".join(
+                    "(" + ", ".join(format_sql_value(clean_field(record.get(table) or {}, col)) for col in cols) + ")"
+                    for _, record in records
+                )
+                # One line per statement: 04_parse_sql.py ends a statement on the first line
+                # holding a ';' outside quotes
+                sql_file.write(f"INSERT IGNORE INTO {table} ({', '.join(cols)}) VALUES {rows};\n")
+                sql_file.write(f"SET {DIMENSION_KEY_VARS[table]} = LAST_INSERT_ID();\n")
+            sql_file.write("\n")
+
+        # 5. Iterate through every record in the JSON
+        for record_index, (row_id, record) in enumerate(records):
             sql_file.write(f"-- [TRANSACTION START] Record ID: {row_id}\n")
-            
-            # --- A. DIMENSION: PATIENT ---
-            # We use ON DUPLICATE KEY UPDATE to handle duplicates gracefully
-            # We capture the ID into a MySQL variable @pat_id
-            p = record.get("dim_patient", {})
-            sql_pat = f"""
-INSERT INTO dim_patient (full_name, gender, birthdate, city, state, zip)
-VALUES ({format_sql_value(p.get('full_name'))}, {format_sql_value(p.get('gender'))}, {format_sql_value(p.get('birthdate'))}, {format_sql_value(p.get('city'))}, {format_sql_value(p.get('state'))}, {format_sql_value(p.get('zip'))})
-ON DUPLICATE KEY UPDATE patient_key=LAST_INSERT_ID(patient_key);
-SET @pat_id = LAST_INSERT_ID();
-"""
-            sql_file.write(sql_pat.strip() + "\n")
-
-            # --- B. DIMENSION: PROVIDER ---
-            dr = record.get("dim_provider", {})
-            sql_prov = f"""
-INSERT INTO dim_provider (name, specialty)
-VALUES ({format_sql_value(dr.get('name'))}, {format_sql_value(dr.get('specialty'))})
-ON DUPLICATE KEY UPDATE provider_key=LAST_INSERT_ID(provider_key);
-SET @prov_id = LAST_INSERT_ID();
-"""
-            sql_file.write(sql_prov.strip() + "\n")
-
-            # --- C. DIMENSION: ORGANIZATION ---
-            org = record.get("dim_organization", {})
-            sql_org = f"""
-INSERT INTO dim_organization (name, city, state)
-VALUES ({format_sql_value(org.get('name'))}, {format_sql_value(org.get('city'))}, {format_sql_value(org.get('state'))})
-ON DUPLICATE KEY UPDATE org_key=LAST_INSERT_ID(org_key);
-SET @org_id = LAST_INSERT_ID();
-"""
-            sql_file.write(sql_org.strip() + "\n")
-
-            # --- D. DIMENSION: PAYER ---
-            ins = record.get("dim_payer", {})
-            sql_payer = f"""
-INSERT INTO dim_payer (name)
-VALUES ({format_sql_value(ins.get('name'))})
-ON DUPLICATE KEY UPDATE payer_key=LAST_INSERT_ID(payer_key);
-SET @payer_id = LAST_INSERT_ID();
-"""
-            sql_file.write(sql_payer.strip() + "\n")
+            keys = ", ".join(f"{DIMENSION_KEY_VARS[table]} + {record_index} * @step" for table, _ in DIMENSIONS)
 
-            # --- E. FACT TABLE: EVENTS ---
-            # We reuse the MySQL variables (@pat_id, @prov_id, etc.) instead of Python values
-            # --- E. FACT TABLE: EVENTS ---
+            # --- FACT TABLE: EVENTS ---
             events = record.get("fact_patient_events", [])
+            event_dates = []
+            for event in events:
+                event_date = clean_field(event, 'event_date')
+                if event_date and event_date not in event_dates:
+                    event_dates.append(event_date)
+
+            if event_dates:
+                # We insert the dates first. "INSERT IGNORE" skips those that already exist.
+                # We only insert the key; other columns (year, month) can be filled later or via triggers
+                date_values = ", ".join(f"({format_sql_value(d)})" for d in event_dates)
+                sql_file.write(f"INSERT IGNORE INTO dim_date (date_key) VALUES {date_values};\n")
+
+            # One statement per event, so a bad row only costs that event
             for event in events:
-                # 1. ENSURE DATE EXISTS
-                event_date = event.get('event_date')
-                if event_date:
-                    # We insert the date first. "INSERT IGNORE" skips if it already exists.
-                    # We only insert the key; other columns (year, month) can be filled later or via triggers
-                    sql_date = f"INSERT IGNORE INTO dim_date (date_key) VALUES ({format_sql_value(event_date)});"
-                    sql_file.write(sql_date + "\n")
-
-                # 2. INSERT FACT
+                values = ", ".join(format_sql_value(clean_field(event, field)) for field in FACT_EVENT_FIELDS)
                 sql_fact = f"""
 INSERT INTO fact_patient_events 
 (patient_key, provider_key, org_key, payer_key, date_key, event_category, encounter_id, code, description, numeric_value, units, cost)
 VALUES 
-(@pat_id, @prov_id, @org_id, @payer_id, {format_sql_value(event_date)}, {format_sql_value(event.get('event_category'))}, {format_sql_value(event.get('encounter_id'))}, {format_sql_value(event.get('code'))}, {format_sql_value(event.get('description'))}, {format_sql_value(event.get('numeric_value'))}, {format_sql_value(event.get('units'))}, {format_sql_value(event.get('cost'))});
+({keys}, {values});
 """
                 sql_file.write(sql_fact.strip() + "\n")
 
             sql_file.write("-- [TRANSACTION END]\n\n")
 
-    print(f"✅ Successfully generated: {OUTPUT_FILE}")
+    return len(records)
+
+def load_records_to_db(records):
+    """
+    Loads the records straight into MySQL with parameterized statements (no intermediate .sql file).
+    Dimensions are inserted one by one to read back their AUTO_INCREMENT key;
+    dates and facts are buffered and sent with executemany every LOAD_BATCH_RECORDS records.
+    Everything is committed once at the end, so a failed load leaves nothing behind to duplicate on re-run.
+    """
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor()
+    seen_dates = set()
+    pending_dates = []
+    pending_facts = []
+    record_count = 0
+
+    def flush():
+        # Dates first: fact_patient_events.date_key references dim_date
+        if pending_dates:
+            cursor.executemany(DATE_INSERT_SQL, [(d,) for d in pending_dates])
+        if pending_facts:
+            cursor.executemany(FACT_INSERT_SQL, pending_facts)
+        pending_dates.clear()
+        pending_facts.clear()
+
+    try:
+        for row_id, record in records:
+            keys = []
+            for table, cols in DIMENSIONS:
+                values = record.get(table) or {}
+                cursor.execute(DIM_INSERT_SQL[table], tuple(clean_field(values, col) for col in cols))
+                keys.append(cursor.lastrowid)
+
+            for event in record.get("fact_patient_events", []):
+                fact = tuple(clean_field(event, field) for field in FACT_EVENT_FIELDS)
+                event_date = fact[0]
+                if event_date and event_date not in seen_dates:
+                    seen_dates.add(event_date)
+                    pending_dates.append(event_date)
+                pending_facts.append((*keys, *fact))
+
+            record_count += 1
+            if record_count % LOAD_BATCH_RECORDS == 0:
+                flush()
+                print(f"  ✓ Sent {record_count} records...")
+
+        flush()
+        conn.commit()
+        return record_count
+    except mysql.connector.Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+def load_json_to_db():
+    if not os.path.exists(INPUT_FILE):
+        print(f"❌ Error: {INPUT_FILE} not found. Please place your JSON file in the same directory.")
+        return
+
+    print(f"🔄 Loading records from {INPUT_FILE} into {DB_CONFIG['database']}...")
+    try:
+        record_count = load_records_to_db(iter_records(INPUT_FILE))
+    except json.JSONDecodeError as e:
+        print(f"❌ Error decoding JSON: {e}")
+        sys.exit(1)
+    except mysql.connector.Error as e:
+        print(f"❌ Database Error: {e}")
+        sys.exit(1)
+
+    print(f"✅ Successfully loaded {record_count} records")
 
 if __name__ == "__main__":
-    generate_sql_script()
\ No newline at end of file
+    # --load : insert directly into MySQL instead of writing OUTPUT_FILE
+    if "--load" in sys.argv[1:]:
+        load_json_to_db()
+    else:
+        generate_sql_script()
\ No newline at end of file
@@ -1,6 +1,7 @@
 import mysql.connector
 import re
 import sys
+from itertools import islice
 
 # Configuration
 DB_CONFIG = {
@@ -10,6 +11,53 @@ DB_CONFIG = {
     'database': 'hospital_analytics_texas'
 }
 
+# Spans with no statement-relevant character, per quoting state (None = outside a string).
+# A backslash always escapes the next character, inside or outside strings.
+STRING_SPAN_RE = {
+    None: re.compile(r'[^\'"\\]*(?:\\.[^\'"\\]*)*'),
+    "'": re.compile(r"[^'\\]*(?:\\.[^'\\]*)*"),
+    '"': re.compile(r'[^"\\]*(?:\\.[^"\\]*)*'),
+}
+
+def quote_state_after(line, quote_char):
+    """Return the open quote character (or None) after scanning line, starting from quote_char"""
+    pos = 0
+    while True:
+        pos = STRING_SPAN_RE[quote_char].match(line, pos).end()
+        if pos >= len(line) or line[pos] == '\\':
+            # End of line (a trailing lone backslash escapes nothing)
+            return quote_char
+        # line[pos] is a quote that opens or closes a string
+        quote_char = None if quote_char else line[pos]
+        pos += 1
+
+def iter_sql_statements(sql_lines):
+    """Yield complete SQL statements from an iterable of lines, preserving ';' inside strings"""
+    current_statement = []
+    quote_char = None
+
+    for line in sql_lines:
+        line = line.rstrip('\n')
+
+        # Skip comments
+        if line.strip().startswith('--') or line.strip().startswith('#'):
+            continue
+        
+        quote_char = quote_state_after(line, quote_char)
+        
+        current_statement.append(line)
+        
+        if ';' in line and quote_char is None:
+            stmt = '\n'.join(current_statement)
+            if stmt.strip():
+                yield stmt
+            current_statement = []
+    
+    if current_statement:
+        stmt = '\n'.join(current_statement)
+        if stmt.strip():
+            yield stmt
+
 def execute_sql_file_robust(sql_file):
     """Execute SQL file with proper delimiter handling and error reporting"""
     try:
@@ -18,81 +66,37 @@ def execute_sql_file_robust(sql_file):
         
         print(f"🔗 Connected to database: {DB_CONFIG['database']}")
         
-        with open(sql_file, 'r', encoding='utf-8') as f:
-            sql_content = f.read()
-        
-        # Split by semicolon but preserve them inside strings
-        statements = []
-        current_statement = []
-        in_string = False
-        quote_char = None
-        
-        lines = sql_content.split('\n')
-        
-        for line in lines:
-            # Skip comments
-            if line.strip().startswith('--') or line.strip().startswith('#'):
-                continue
-            
-            i = 0
-            while i < len(line):
-                char = line[i]
-                
-                if char == '\\' and i + 1 < len(line):
-                    i += 2
-                    continue
-                
-                if char in ("'", '"') and not in_string:
-                    in_string = True
-                    quote_char = char
-                elif char == quote_char and in_string:
-                    in_string = False
-                    quote_char = None
-                
-                i += 1
-            
-            current_statement.append(line)
-            
-            if ';' in line and not in_string:
-                stmt = '\n'.join(current_statement)
-                if stmt.strip():
-                    statements.append(stmt)
-                current_statement = []
-        
-        if current_statement:
-            stmt = '\n'.join(current_statement)
-            if stmt.strip():
-                statements.append(stmt)
-        
-        print(f"📝 Found {len(statements)} SQL statements")
-        print(f"🚀 Executing statements...\n")
-        
         success_count = 0
         error_count = 0
         
-        for idx, statement in enumerate(statements, 1):
-            statement = statement.strip()
-            if not statement or statement == ';':
-                continue
+        # Stream the file line by line: statements are executed as soon as
+        # they are complete instead of loading the whole script in memory
+        with open(sql_file, 'r', encoding='utf-8') as f:
+            print(f"🚀 Executing statements...\n")
             
-            try:
-                statement = statement.rstrip(';')
-                cursor.execute(statement)
-                success_count += 1
+            for idx, statement in enumerate(iter_sql_statements(f), 1):
+                statement = statement.strip()
+                if not statement or statement == ';':
+                    continue
                 
-                if idx % 100 == 0:
-                    print(f"  ✓ Executed {idx}/{len(statements)} statements...")
+                try:
+                    statement = statement.rstrip(';')
+                    cursor.execute(statement)
+                    success_count += 1
                     
-            except mysql.connector.Error as e:
-                error_count += 1
-                print(f"\n❌ Error in statement {idx}:")
-                print(f"   Error code: {e.errno}")
-                print(f"   Error message: {e.msg}")
-                print(f"   Statement preview: {statement[:200]}...\n")
-                
-                if error_count > 3:
-                    print(f"⚠️  Too many errors ({error_count}). Stopping execution.")
-                    break
+                    if idx % 100 == 0:
+                        print(f"  ✓ Executed {idx} statements...")
+                        
+                except mysql.connector.Error as e:
+                    error_count += 1
+                    print(f"\n❌ Error in statement {idx}:")
+                    print(f"   Error code: {e.errno}")
+                    print(f"   Error message: {e.msg}")
+                    print(f"   Statement preview: {statement[:200]}...\n")
+                    
+                    if error_count > 3:
+                        print(f"⚠️  Too many errors ({error_count}). Stopping execution.")
+                        break
         
         conn.commit()
         print(f"\n{'='*60}")
@@ -112,13 +116,38 @@ def execute_sql_file_robust(sql_file):
             conn.close()
             print(f"🔌 Database connection closed")
 
+DIM_DATE_INSERT_PREFIX = "INSERT IGNORE INTO dim_date"
+
+def seed_dim_dates(sql_files):
+    """Insert every dim_date row referenced by the given SQL files in one committed transaction,
+    so the files can then be loaded in parallel without locking each other on shared dates"""
+    date_statements = set()
+    for sql_file in sql_files:
+        with open(sql_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.startswith(DIM_DATE_INSERT_PREFIX):
+                    date_statements.add(line.strip().rstrip(';'))
+
+    try:
+        conn = mysql.connector.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        for statement in sorted(date_statements):
+            cursor.execute(statement)
+        conn.commit()
+        print(f"📅 Seeded {len(date_statements)} dim_date rows from {len(sql_files)} files")
+    except mysql.connector.Error as e:
+        print(f"❌ Database Error: {e}")
+        sys.exit(1)
+    finally:
+        if 'conn' in locals() and conn.is_connected():
+            cursor.close()
+            conn.close()
+
 def preview_sql_file(sql_file):
     """Preview first few statements in the SQL file"""
     try:
         with open(sql_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        statements = [s.strip() for s in content.split(';') if s.strip()][:5]
+            statements = [s.strip() for s in islice(iter_sql_statements(f), 5)]
         
         print(f"📄 Preview of first 5 statements in {sql_file}:\n")
         for idx, stmt in enumerate(statements, 1):
@@ -135,6 +164,10 @@ if __name__ == "__main__":
 
     args = sys.argv
 
+    if len(args) >= 3 and args[1] == "--seed-dates":
+        seed_dim_dates(args[2:])
+        sys.exit(0)
+
     if len(args) >= 2:
         sql_file = args[1]  # user-provided file
     else:
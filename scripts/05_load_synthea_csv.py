@@ -1,4 +1,9 @@
 import os
+import csv
+import copy
+import math
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 import mysql.connector
 from dotenv import load_dotenv
@@ -10,6 +15,14 @@ try:
 except ImportError:
     def tqdm(iterator, **kwargs): return iterator
 
+# Optional: parse whole CSVs with pyarrow's multithreaded reader, fallback to pandas' C engine
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    CSV_ENGINE = "pyarrow"
+except ImportError:
+    CSV_ENGINE = "c"
+
 # --- CONFIGURATION ---
 load_dotenv()
 
@@ -24,6 +37,98 @@ DB_CONFIG = {
 
 DATA_FOLDER = r"ressources\texas_data"
 BATCH_SIZE = 5000  # Number of rows to insert at once
+OBSERVATIONS_CHUNK_SIZE = 200_000  # observations.csv is streamed in chunks of this many rows
+FACT_LOAD_WORKERS = 3  # Fact files loaded concurrently, each on its own connection
+
+# One-shot load: skip per-row unique/FK verification on every connection.
+# Keys come from our own caches, so they are consistent by construction.
+BULK_SESSION_SQL = "SET SESSION unique_checks = 0, foreign_key_checks = 0"
+
+# Every fact loader builds its tuples in this column order, so the INSERT
+# statement is rendered once here instead of being rebuilt in each loader.
+FACT_COLUMNS = (
+    "patient_key", "date_key", "provider_key", "org_key", "payer_key", "encounter_id",
+    "event_category", "code", "description", "numeric_value", "units", "cost",
+)
+FACT_INSERT_SQL = (
+    f"INSERT INTO fact_patient_events ({', '.join(FACT_COLUMNS)}) "
+    f"VALUES ({', '.join(['%s'] * len(FACT_COLUMNS))})"
+)
+
+# Same columns, streamed as a tab-separated file (\N = NULL) for the bulk path
+FACT_LOAD_DATA_SQL = (
+    "LOAD DATA LOCAL INFILE %s INTO TABLE fact_patient_events "
+    "CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+    f"({', '.join(FACT_COLUMNS)})"
+)
+
+# Columns each loader actually uses (Synthea exports carry many more). Columns missing
+# from a given export (e.g. PAYER/TOTALCOST in older medications.csv) are skipped.
+CSV_COLUMNS = {
+    "patients.csv": ['Id', 'FIRST', 'LAST', 'GENDER', 'BIRTHDATE', 'CITY', 'STATE', 'ZIP'],
+    "encounters.csv": ['Id', 'START', 'PATIENT', 'ORGANIZATION', 'PROVIDER', 'PAYER',
+                       'ENCOUNTERCLASS', 'DESCRIPTION', 'TOTAL_CLAIM_COST'],
+    "careplans.csv": ['START', 'PATIENT', 'ENCOUNTER', 'CODE', 'DESCRIPTION'],
+    "conditions.csv": ['START', 'PATIENT', 'ENCOUNTER', 'CODE', 'DESCRIPTION'],
+    "medications.csv": ['START', 'PATIENT', 'PAYER', 'ENCOUNTER', 'CODE', 'DESCRIPTION', 'TOTALCOST'],
+    "allergies.csv": ['START', 'PATIENT', 'ENCOUNTER', 'CODE', 'DESCRIPTION'],
+    "observations.csv": ['DATE', 'PATIENT', 'ENCOUNTER', 'CODE', 'DESCRIPTION', 'VALUE', 'UNITS'],
+}
+# Read as text even when they look numeric (no type inference, codes keep leading zeros,
+# ZIP is not turned into a float; VALUE mixes numbers and coded answers).
+# Typed at parse time on both engines, empty cells are NULL rather than "" or "nan"
+CSV_TEXT_COLUMNS = {'Id', 'PATIENT', 'ENCOUNTER', 'CODE', 'ZIP', 'VALUE', 'UNITS'}
+
+# Event date column of each fact file, all inserted into dim_date before the fact loads.
+# observations.csv is left out: it is the largest file, so load_observations inserts
+# its dates chunk by chunk during the fact pass instead of reading it twice.
+FACT_DATE_COLUMNS = {
+    "encounters.csv": 'START', "careplans.csv": 'START', "conditions.csv": 'START',
+    "medications.csv": 'START', "allergies.csv": 'START',
+}
+
+def read_synthea_csv(path, date_columns=(), **kwargs):
+    """
+    pd.read_csv limited to the CSV_COLUMNS of the file, on the fastest available engine.
+    Date columns stay raw strings: the date cache is keyed by the CSV text.
+    pandas' pyarrow engine applies dtype only after inferring Arrow types (timestamps
+    would come back as "YYYY-MM-DD HH:MM:SS+00:00"), so pyarrow.csv is called directly
+    with the text columns typed as strings at parse time.
+    """
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = [column for column in CSV_COLUMNS[os.path.basename(path)] if column in header]
+    dtype = {column: str for column in usecols
+             if column in CSV_TEXT_COLUMNS or column in date_columns}
+
+    # The pyarrow engine has no chunksize, chunked reads stay on pandas' C parser
+    if "chunksize" in kwargs:
+        return pd.read_csv(path, engine="c", usecols=usecols, dtype=dtype, **kwargs)
+    if CSV_ENGINE == "pyarrow":
+        convert_options = pa_csv.ConvertOptions(
+            include_columns=usecols,
+            column_types={column: pa.string() for column in dtype},
+            strings_can_be_null=True,  # empty text cells become NULL, as with the C engine
+        )
+        return pa_csv.read_csv(path, convert_options=convert_options).to_pandas()
+
+    # Infer the remaining column types over the whole file in one pass
+    return pd.read_csv(path, engine="c", usecols=usecols, dtype=dtype, low_memory=False, **kwargs)
+
+def _nullable(series):
+    """Column values as a Python list, with NaN/NA turned into None (sent as NULL)."""
+    return series.astype(object).where(series.notna(), None).tolist()
+
+def read_small_csv(path):
+    """Rows of a small dimension CSV as dicts (no pandas needed), empty fields as None."""
+    with open(path, newline='', encoding='utf-8') as f:
+        return [{key: value or None for key, value in row.items()} for row in csv.DictReader(f)]
+
+def _tsv_field(value):
+    """Formats one value for LOAD DATA: NULL marker, then escape the special characters."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "\\N"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
 
 class SmartDataETL:
     def __init__(self):
@@ -32,6 +137,7 @@ class SmartDataETL:
             self.conn = mysql.connector.connect(**DB_CONFIG)
             self.cursor = self.conn.cursor() 
             self.conn.autocommit = False
+            self.cursor.execute(BULK_SESSION_SQL)
             
             # Initialize Caches
             self.cache_patients = {}
@@ -48,27 +154,100 @@ class SmartDataETL:
     # HELPER: BATCH PROCESSING
     # =================================================
 
-    def _batch_insert(self, sql, data, desc="Inserting"):
-        """Generic helper to insert data in chunks."""
-        if not data: return
+    def _batch_insert(self, sql, data, desc="Inserting", atomic=False, commit=True):
+        """
+        Generic helper to insert data in chunks, committed once for the whole table.
+        Returns the (start, stop) row ranges of the batches that were committed.
+        With atomic=True any failed batch rolls back the whole load and is re-raised.
+        """
+        if not data: return []
 
         total = len(data)
+        inserted = []
         # Use tqdm for a progress bar if available
         for i in tqdm(range(0, total, BATCH_SIZE), desc=f"   💾 {desc}", unit="batch"):
             batch = data[i:i + BATCH_SIZE]
             try:
                 self.cursor.executemany(sql, batch)
-                self.conn.commit()
+                inserted.append((i, i + len(batch)))
             except mysql.connector.Error as err:
                 print(f"Error in batch {i}: {err}")
-                self.conn.rollback()
+                if atomic:
+                    self.conn.rollback()
+                    raise
+                # A failed statement is rolled back on its own, earlier batches stay pending
                 # Optional: Re-connect if connection lost
                 if not self.conn.is_connected():
                      print("   ⚠️ Reconnecting...")
                      self.conn.reconnect(attempts=3, delay=2)
                      self.cursor = self.conn.cursor()
+                     self.cursor.execute(BULK_SESSION_SQL)
+                     # The pending batches died with the old session
+                     inserted.clear()
+        if commit:
+            self.conn.commit()
+        return inserted
+
+    def _bulk_load(self, data, desc="Loading", commit=True):
+        """
+        Streams fact rows to MySQL with LOAD DATA LOCAL INFILE (one statement per table).
+        Falls back to _batch_insert if the server refuses local infile.
+        FK checks are off for the session, so a failed fallback batch aborts the table
+        instead of leaving a partial load; commit=False lets chunked loaders commit once.
+        """
+        if not data: return
+
+        tmp = tempfile.NamedTemporaryFile("w", encoding="utf-8", newline="\n", suffix=".tsv", delete=False)
+        try:
+            with tmp:
+                for row in data:
+                    tmp.write("\t".join(_tsv_field(value) for value in row) + "\n")
 
-    def _ensure_dates_exist(self, date_series):
+            print(f"   💾 {desc}: bulk loading {len(data)} rows...")
+            self.cursor.execute(FACT_LOAD_DATA_SQL, (tmp.name,))
+            if commit:
+                self.conn.commit()
+        except mysql.connector.Error as err:
+            # The failed statement is undone on its own, earlier chunks stay pending
+            print(f"   ⚠️ LOAD DATA unavailable ({err}), falling back to batched INSERTs")
+            self._batch_insert(FACT_INSERT_SQL, data, desc, atomic=True, commit=commit)
+        finally:
+            os.remove(tmp.name)
+
+    def _insert_dimension(self, table, key_column, columns, ids, rows, cache, desc):
+        """
+        Inserts dimension rows as multi-row INSERTs with surrogate keys assigned here
+        (continuing from the current MAX key), then maps each source Id to its key.
+        This script is the only writer while it runs, so the key range cannot collide.
+        Only rows of committed batches are cached, so facts never point at a missing key.
+        """
+        self.cursor.execute(f"SELECT COALESCE(MAX({key_column}), 0) FROM {table}")
+        first_key = self.cursor.fetchone()[0] + 1
+        keys = range(first_key, first_key + len(rows))
+
+        sql = (f"INSERT INTO {table} ({key_column}, {', '.join(columns)}) "
+               f"VALUES ({', '.join(['%s'] * (len(columns) + 1))})")
+        inserted = self._batch_insert(sql, [(key, *row) for key, row in zip(keys, rows)], desc)
+
+        ids = list(ids)
+        for start, stop in inserted:
+            cache.update(zip(ids[start:stop], keys[start:stop]))
+
+    def _fact_rows(self, columns):
+        """
+        Builds fact tuples column-wise from a {fact column: Series or scalar} mapping.
+        Rows with an unknown patient are dropped, missing columns and values become NULL.
+        """
+        facts = pd.DataFrame(columns, columns=list(FACT_COLUMNS))
+        facts = facts[facts['patient_key'].notna()]
+
+        # Keys come out of Series.map as floats when some lookups miss
+        key_columns = ["patient_key", "provider_key", "org_key", "payer_key"]
+        facts[key_columns] = facts[key_columns].astype("Int64")
+
+        return list(zip(*(_nullable(facts[column]) for column in FACT_COLUMNS)))
+
+    def _ensure_dates_exist(self, date_series, commit=True):
         """
         Takes a pandas Series of dates (strings), finds unique ones, 
         inserts missing ones into DB, and updates local cache.
@@ -82,39 +261,50 @@ class SmartDataETL:
         if not new_dates:
             return
 
-        # 3. Prepare batch data
-        batch_data = []
-        for d_str in new_dates:
-            try:
-                dt = pd.to_datetime(d_str)
-                if pd.isna(dt): continue
-                
-                date_val = dt.date()
-                batch_data.append((
-                    date_val, dt.year, dt.month, dt.strftime('%B'), dt.strftime('%A')
-                ))
-                # Update cache immediately
-                self.cache_dates[d_str] = date_val
-            except:
-                continue
+        # 3. Prepare batch data (one vectorized parse, unparseable dates are dropped)
+        # Files mix ISO datetimes ("2019-02-17T05:07:38Z") and plain dates ("2019-02-17"),
+        # so only the day part is parsed; the cache stays keyed by the original text
+        parsed = pd.to_datetime(pd.Series(new_dates, index=new_dates, dtype=str).str[:10],
+                                format='%Y-%m-%d', errors='coerce').dropna()
+        self.cache_dates.update(parsed.dt.date.items())
+
+        days = parsed.drop_duplicates()
+        # .tolist() hands the connector plain Python ints (it rejects numpy scalars)
+        batch_data = list(zip(
+            days.dt.date.tolist(), days.dt.year.tolist(), days.dt.month.tolist(),
+            days.dt.month_name().tolist(), days.dt.day_name().tolist()
+        ))
 
         # 4. INSERT IN BATCHES
         if batch_data:
             print(f"   📅 Pre-loading {len(batch_data)} new dates in batches...")
-            sql = """INSERT IGNORE INTO dim_date 
+            # ON DUPLICATE KEY (not INSERT IGNORE) so executemany packs multi-row VALUES
+            sql = """INSERT INTO dim_date 
                      (date_key, year, month, month_name, day_of_week) 
-                     VALUES (%s, %s, %s, %s, %s)"""
-            
-            # We reuse the batch logic manually here to avoid circular dependencies or complex refactoring
-            total = len(batch_data)
-            for i in range(0, total, BATCH_SIZE):
-                batch = batch_data[i:i + BATCH_SIZE]
-                try:
-                    self.cursor.executemany(sql, batch)
-                    self.conn.commit()
-                except mysql.connector.Error as e:
-                    print(f"   ⚠️ Date Batch Error: {e}")
-                    self.conn.rollback()
+                     VALUES (%s, %s, %s, %s, %s)
+                     ON DUPLICATE KEY UPDATE date_key = date_key"""
+        
+            # Every fact row points at these dates, so a failed batch aborts the load
+            self._batch_insert(sql, batch_data, "Dates", atomic=True, commit=commit)
+
+    def _preload_all_dates(self):
+        """
+        Reads only the date column of every FACT_DATE_COLUMNS file and inserts all their
+        dates into dim_date in one pass, before the (parallel) fact loaders run.
+        """
+        print("\n🚀 Pre-loading event dates...")
+        unique_dates = []
+        for file_name, date_column in FACT_DATE_COLUMNS.items():
+            path = os.path.join(DATA_FOLDER, file_name)
+            if not os.path.exists(path): continue
+
+            # Chunked so a large file never holds its full date column in memory
+            for chunk in pd.read_csv(path, usecols=[date_column], dtype=str,
+                                     chunksize=OBSERVATIONS_CHUNK_SIZE):
+                unique_dates.append(pd.Series(chunk[date_column].dropna().unique()))
+
+        if unique_dates:
+            self._ensure_dates_exist(pd.concat(unique_dates, ignore_index=True))
 
     # =================================================
     # SECTION 1: DIMENSION LOADERS
@@ -125,56 +315,45 @@ class SmartDataETL:
         csv_path = os.path.join(DATA_FOLDER, "payers.csv")
         if not os.path.exists(csv_path): return
         
-        df = pd.read_csv(csv_path).where(pd.notnull, None)
-        sql = "INSERT INTO dim_payer (name) VALUES (%s)"
-        
-        for row in df.itertuples():
-            self.cursor.execute(sql, (row.NAME,))
-            self.cache_payers[row.Id] = self.cursor.lastrowid
-        self.conn.commit()
+        records = read_small_csv(csv_path)
+        rows = [(r['NAME'],) for r in records]
+        self._insert_dimension("dim_payer", "payer_key", ("name",),
+                               [r['Id'] for r in records], rows, self.cache_payers, "Payers")
 
     def load_organizations(self):
         print("\n🚀 Processing Organizations...")
         csv_path = os.path.join(DATA_FOLDER, "organizations.csv")
         if not os.path.exists(csv_path): return
         
-        df = pd.read_csv(csv_path).where(pd.notnull, None)
-        sql = "INSERT INTO dim_organization (name, city, state) VALUES (%s, %s, %s)"
-        
-        for row in df.itertuples():
-            self.cursor.execute(sql, (row.NAME, row.CITY, row.STATE))
-            self.cache_orgs[row.Id] = self.cursor.lastrowid
-        self.conn.commit()
+        records = read_small_csv(csv_path)
+        rows = [(r['NAME'], r['CITY'], r['STATE']) for r in records]
+        self._insert_dimension("dim_organization", "org_key", ("name", "city", "state"),
+                               [r['Id'] for r in records], rows, self.cache_orgs, "Organizations")
 
     def load_providers(self):
         print("\n🚀 Processing Providers...")
         csv_path = os.path.join(DATA_FOLDER, "providers.csv")
         if not os.path.exists(csv_path): return
         
-        df = pd.read_csv(csv_path).where(pd.notnull, None)
-        sql = "INSERT INTO dim_provider (name, specialty) VALUES (%s, %s)"
-        
-        for row in df.itertuples():
-            self.cursor.execute(sql, (row.NAME, row.SPECIALITY))
-            self.cache_providers[row.Id] = self.cursor.lastrowid
-        self.conn.commit()
+        records = read_small_csv(csv_path)
+        rows = [(r['NAME'], r['SPECIALITY']) for r in records]
+        self._insert_dimension("dim_provider", "provider_key", ("name", "specialty"),
+                               [r['Id'] for r in records], rows, self.cache_providers, "Providers")
 
     def load_patients(self):
         print("\n🚀 Processing Patients...")
         csv_path = os.path.join(DATA_FOLDER, "patients.csv")
         if not os.path.exists(csv_path): return
         
-        df = pd.read_csv(csv_path).where(pd.notnull, None)
-        sql = """INSERT INTO dim_patient (full_name, gender, birthdate, city, state, zip)
-                 VALUES (%s, %s, %s, %s, %s, %s)"""
-
-        for row in df.itertuples():
-            full_name = f"{row.FIRST} {row.LAST}"
-            zip_code = str(row.ZIP) if row.ZIP else None
-            self.cursor.execute(sql, (full_name, row.GENDER, row.BIRTHDATE, 
-                                    row.CITY, row.STATE, zip_code))
-            self.cache_patients[row.Id] = self.cursor.lastrowid
-        self.conn.commit()
+        df = read_synthea_csv(csv_path, date_columns=['BIRTHDATE'])
+        rows = list(zip(
+            _nullable(df['FIRST'] + " " + df['LAST']), _nullable(df['GENDER']),
+            _nullable(df['BIRTHDATE']), _nullable(df['CITY']), _nullable(df['STATE']),
+            _nullable(df['ZIP']),
+        ))
+        self._insert_dimension("dim_patient", "patient_key",
+                               ("full_name", "gender", "birthdate", "city", "state", "zip"),
+                               df['Id'], rows, self.cache_patients, "Patients")
 
     # =================================================
     # SECTION 2: OPTIMIZED FACT LOADERS
@@ -185,199 +364,144 @@ class SmartDataETL:
         path = os.path.join(DATA_FOLDER, "encounters.csv")
         if not os.path.exists(path): return
         
-        df = pd.read_csv(path).where(pd.notnull, None)
-        self._ensure_dates_exist(df['START'])
+        df = read_synthea_csv(path, date_columns=['START'])
 
-        data_to_insert = []
         print("   ⚙️ Mapping data...")
-        
-        for row in df.itertuples():
-            pat_key = self.cache_patients.get(row.PATIENT)
-            if not pat_key: continue
-
-            data_to_insert.append((
-                pat_key,
-                self.cache_dates.get(row.START),
-                self.cache_providers.get(row.PROVIDER),
-                self.cache_orgs.get(row.ORGANIZATION),
-                self.cache_payers.get(row.PAYER),
-                row.Id,
-                'Encounter',
-                row.ENCOUNTERCLASS,
-                row.DESCRIPTION,
-                None, None, # val, units
-                row.TOTAL_CLAIM_COST
-            ))
-
-        sql = """INSERT INTO fact_patient_events 
-                 (patient_key, date_key, provider_key, org_key, payer_key, encounter_id, 
-                  event_category, code, description, numeric_value, units, cost)
-                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
-        
-        self._batch_insert(sql, data_to_insert, "Encounters")
+        data_to_insert = self._fact_rows({
+            "patient_key": df['PATIENT'].map(self.cache_patients),
+            "date_key": df['START'].map(self.cache_dates),
+            "provider_key": df['PROVIDER'].map(self.cache_providers),
+            "org_key": df['ORGANIZATION'].map(self.cache_orgs),
+            "payer_key": df['PAYER'].map(self.cache_payers),
+            "encounter_id": df['Id'],
+            "event_category": 'Encounter',
+            "code": df['ENCOUNTERCLASS'],
+            "description": df['DESCRIPTION'],
+            "cost": df['TOTAL_CLAIM_COST'],
+        })
+
+        self._bulk_load(data_to_insert, "Encounters")
 
     def load_careplans(self):
         print("\n🚀 Processing CarePlans...")
         path = os.path.join(DATA_FOLDER, "careplans.csv")
         if not os.path.exists(path): return
         
-        df = pd.read_csv(path).where(pd.notnull, None)
-        self._ensure_dates_exist(df['START'])
-
-        data_to_insert = []
-        for row in df.itertuples():
-            pat_key = self.cache_patients.get(row.PATIENT)
-            if not pat_key: continue
-
-            data_to_insert.append((
-                pat_key,
-                self.cache_dates.get(row.START),
-                None, None, None,
-                row.ENCOUNTER,
-                'CarePlan',
-                row.CODE,
-                row.DESCRIPTION,
-                None, None, None
-            ))
-
-        sql = """INSERT INTO fact_patient_events 
-                 (patient_key, date_key, provider_key, org_key, payer_key, encounter_id, 
-                  event_category, code, description, numeric_value, units, cost)
-                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
-        self._batch_insert(sql, data_to_insert, "CarePlans")
+        df = read_synthea_csv(path, date_columns=['START'])
+
+        data_to_insert = self._fact_rows({
+            "patient_key": df['PATIENT'].map(self.cache_patients),
+            "date_key": df['START'].map(self.cache_dates),
+            "encounter_id": df['ENCOUNTER'],
+            "event_category": 'CarePlan',
+            "code": df['CODE'],
+            "description": df['DESCRIPTION'],
+        })
+
+        self._bulk_load(data_to_insert, "CarePlans")
 
     def load_conditions(self):
         print("\n🚀 Processing Conditions...")
         path = os.path.join(DATA_FOLDER, "conditions.csv")
         if not os.path.exists(path): return
         
-        df = pd.read_csv(path).where(pd.notnull, None)
-        self._ensure_dates_exist(df['START'])
-
-        data_to_insert = []
-        for row in df.itertuples():
-            pat_key = self.cache_patients.get(row.PATIENT)
-            if not pat_key: continue
-
-            data_to_insert.append((
-                pat_key,
-                self.cache_dates.get(row.START),
-                None, None, None,
-                row.ENCOUNTER,
-                'Diagnosis',
-                row.CODE,
-                row.DESCRIPTION,
-                None, None, None
-            ))
-
-        sql = """INSERT INTO fact_patient_events 
-                 (patient_key, date_key, provider_key, org_key, payer_key, encounter_id, 
-                  event_category, code, description, numeric_value, units, cost)
-                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
-        self._batch_insert(sql, data_to_insert, "Conditions")
+        df = read_synthea_csv(path, date_columns=['START'])
+
+        data_to_insert = self._fact_rows({
+            "patient_key": df['PATIENT'].map(self.cache_patients),
+            "date_key": df['START'].map(self.cache_dates),
+            "encounter_id": df['ENCOUNTER'],
+            "event_category": 'Diagnosis',
+            "code": df['CODE'],
+            "description": df['DESCRIPTION'],
+        })
+
+        self._bulk_load(data_to_insert, "Conditions")
 
     def load_medications(self):
         print("\n🚀 Processing Medications...")
         path = os.path.join(DATA_FOLDER, "medications.csv")
         if not os.path.exists(path): return
         
-        df = pd.read_csv(path).where(pd.notnull, None)
-        self._ensure_dates_exist(df['START'])
-
-        data_to_insert = []
-        for row in df.itertuples():
-            pat_key = self.cache_patients.get(row.PATIENT)
-            if not pat_key: continue
-
-            data_to_insert.append((
-                pat_key,
-                self.cache_dates.get(row.START),
-                None, None, 
-                self.cache_payers.get(getattr(row, 'PAYER', None)), 
-                row.ENCOUNTER,
-                'Medication',
-                row.CODE,
-                row.DESCRIPTION,
-                None, None,
-                getattr(row, 'TOTALCOST', None)
-            ))
-
-        sql = """INSERT INTO fact_patient_events 
-                 (patient_key, date_key, provider_key, org_key, payer_key, encounter_id, 
-                  event_category, code, description, numeric_value, units, cost)
-                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
-        self._batch_insert(sql, data_to_insert, "Medications")
+        df = read_synthea_csv(path, date_columns=['START'])
+
+        # PAYER and TOTALCOST are not present in every Synthea export
+        data_to_insert = self._fact_rows({
+            "patient_key": df['PATIENT'].map(self.cache_patients),
+            "date_key": df['START'].map(self.cache_dates),
+            "payer_key": df['PAYER'].map(self.cache_payers) if 'PAYER' in df else None,
+            "encounter_id": df['ENCOUNTER'],
+            "event_category": 'Medication',
+            "code": df['CODE'],
+            "description": df['DESCRIPTION'],
+            "cost": df.get('TOTALCOST'),
+        })
+
+        self._bulk_load(data_to_insert, "Medications")
 
     def load_allergies(self):
         print("\n🚀 Processing Allergies...")
         path = os.path.join(DATA_FOLDER, "allergies.csv")
         if not os.path.exists(path): return
         
-        df = pd.read_csv(path).where(pd.notnull, None)
-        self._ensure_dates_exist(df['START'])
-
-        data_to_insert = []
-        for row in df.itertuples():
-            pat_key = self.cache_patients.get(row.PATIENT)
-            if not pat_key: continue
-
-            data_to_insert.append((
-                pat_key,
-                self.cache_dates.get(row.START),
-                None, None, None,
-                row.ENCOUNTER,
-                'Allergy',
-                row.CODE,
-                row.DESCRIPTION,
-                None, None, None
-            ))
-
-        sql = """INSERT INTO fact_patient_events 
-                 (patient_key, date_key, provider_key, org_key, payer_key, encounter_id, 
-                  event_category, code, description, numeric_value, units, cost)
-                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
-        self._batch_insert(sql, data_to_insert, "Allergies")
+        df = read_synthea_csv(path, date_columns=['START'])
+
+        data_to_insert = self._fact_rows({
+            "patient_key": df['PATIENT'].map(self.cache_patients),
+            "date_key": df['START'].map(self.cache_dates),
+            "encounter_id": df['ENCOUNTER'],
+            "event_category": 'Allergy',
+            "code": df['CODE'],
+            "description": df['DESCRIPTION'],
+        })
+
+        self._bulk_load(data_to_insert, "Allergies")
 
     def load_observations(self):
         print("\n🚀 Processing Observations...")
         path = os.path.join(DATA_FOLDER, "observations.csv")
         if not os.path.exists(path): return
         
-        # Chunked Read for massive files
-        df = pd.read_csv(path).where(pd.notnull, None)
-        self._ensure_dates_exist(df['DATE'])
+        # Own date cache: this worker adds the observation-only dates while the other
+        # loaders read the shared one
+        self.cache_dates = dict(self.cache_dates)
+
+        # observations.csv is by far the largest file: stream it chunk by chunk
+        chunks = read_synthea_csv(path, date_columns=['DATE'], chunksize=OBSERVATIONS_CHUNK_SIZE)
+        for chunk_idx, df in enumerate(chunks, 1):
+            # Its dates are not preloaded; they join the file's transaction, so a failed
+            # load rolls them back along with the facts
+            self._ensure_dates_exist(df['DATE'], commit=False)
+
+            # Non-numeric observation values (e.g. coded answers) are stored as NULL
+            data_to_insert = self._fact_rows({
+                "patient_key": df['PATIENT'].map(self.cache_patients),
+                "date_key": df['DATE'].map(self.cache_dates),
+                "encounter_id": df['ENCOUNTER'],
+                "event_category": 'Observation',
+                "code": df['CODE'],
+                "description": df['DESCRIPTION'],
+                "numeric_value": pd.to_numeric(df['VALUE'], errors='coerce'),
+                "units": df['UNITS'],
+            })
+
+            self._bulk_load(data_to_insert, f"Observations (chunk {chunk_idx})", commit=False)
+
+        # One commit for the whole file, so a failed chunk rolls back every chunk
+        self.conn.commit()
 
-        print("   ⚙️ Mapping data...")
-        data_to_insert = []
-        
-        # Note: If mapping 5000 patients (2M rows) takes too long here, 
-        # we can move mapping inside the batch loop, but this is usually fine for <5GB RAM
-        for row in df.itertuples():
-            pat_key = self.cache_patients.get(row.PATIENT)
-            if not pat_key: continue
-
-            try: val = float(row.VALUE) 
-            except: val = None 
-
-            data_to_insert.append((
-                pat_key,
-                self.cache_dates.get(row.DATE),
-                None, None, None,
-                row.ENCOUNTER,
-                'Observation',
-                row.CODE,
-                row.DESCRIPTION,
-                val,
-                row.UNITS,
-                None
-            ))
-
-        sql = """INSERT INTO fact_patient_events 
-                 (patient_key, date_key, provider_key, org_key, payer_key, encounter_id, 
-                  event_category, code, description, numeric_value, units, cost)
-                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
-        
-        self._batch_insert(sql, data_to_insert, "Observations")
+    def _run_on_own_connection(self, loader_name):
+        """Runs one loader on a copy of this ETL that shares the caches but has its own connection."""
+        worker = copy.copy(self)
+        worker.conn = mysql.connector.connect(**DB_CONFIG)
+        worker.conn.autocommit = False
+        worker.cursor = worker.conn.cursor()
+        worker.cursor.execute(BULK_SESSION_SQL)
+        try:
+            getattr(worker, loader_name)()
+        finally:
+            worker.cursor.close()
+            worker.conn.close()
 
     def run(self):
         start_time = time.time()
@@ -387,12 +511,23 @@ class SmartDataETL:
             self.load_providers()
             self.load_patients()
             
-            self.load_encounters()
-            self.load_careplans()
-            self.load_conditions()
-            self.load_medications()
-            self.load_allergies()
-            self.load_observations()
+            self._preload_all_dates()
+
+            # Fact files only read the (now complete) dimension and date caches, so they can be
+            # loaded side by side, each worker on its own connection
+            fact_loaders = [
+                "load_observations", "load_encounters", "load_medications",
+                "load_conditions", "load_careplans", "load_allergies",
+            ]
+            with ThreadPoolExecutor(max_workers=FACT_LOAD_WORKERS) as executor:
+                futures = [executor.submit(self._run_on_own_connection, name) for name in fact_loaders]
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                except Exception:
+                    # Don't start the queued loaders once one has failed (running ones still finish)
+                    executor.shutdown(cancel_futures=True)
+                    raise
             
             duration = time.time() - start_time
             print(f"\n✨ ETL Pipeline Complete in {duration:.2f} seconds.")
@@ -400,6 +535,7 @@ class SmartDataETL:
             print(f"❌ Pipeline Failed: {e}")
             import traceback
             traceback.print_exc()
+            exit(1)
         finally:
             if self.conn.is_connected():
                 self.conn.close()
@@ -1,6 +1,15 @@
 import mysql.connector
 from datetime import datetime
 
+# Optional: use sqlparse (real SQL tokenizer) when installed, fallback to a plain ';' split
+try:
+    import sqlparse
+    def split_sql_script(sql_script):
+        # Comments are dropped so message SELECTs are recognised by their first keyword
+        return sqlparse.split(sqlparse.format(sql_script, strip_comments=True))
+except ImportError:
+    def split_sql_script(sql_script): return sql_script.split(';')
+
 # Configuration
 DB_CONFIG = {
     'host': 'localhost',
@@ -11,6 +20,51 @@ DB_CONFIG = {
 
 SQL_FILE = 'SQL\cleaninig.sql'  
 
+# Post-cleaning statistics and quality checks, computed in one round trip with
+# each table scanned once (instead of one COUNT(*) query per figure)
+SUMMARY_QUERY = """
+    SELECT p.*, o.*, pr.*,
+        (SELECT COUNT(*) FROM dim_payer) AS total_payers,
+        (SELECT COUNT(*) FROM fact_patient_events) AS total_events
+    FROM (
+        SELECT COUNT(*) AS total_patients,
+            COALESCE(SUM(gender IS NOT NULL AND gender != ''), 0) AS with_gender,
+            COALESCE(SUM(birthdate IS NOT NULL), 0) AS with_birthdate,
+            COALESCE(SUM(gender IS NULL OR gender = ''), 0) AS null_gender,
+            COALESCE(SUM(birthdate IS NULL), 0) AS null_birthdate,
+            COALESCE(SUM(city IS NULL OR city = ''), 0) AS null_patient_city
+        FROM dim_patient
+    ) p
+    CROSS JOIN (
+        SELECT COUNT(*) AS total_orgs,
+            COALESCE(SUM(city IS NULL OR city = ''), 0) AS null_org_city
+        FROM dim_organization
+    ) o
+    CROSS JOIN (
+        SELECT COUNT(*) AS total_providers,
+            COALESCE(SUM(specialty IS NULL OR specialty = ''), 0) AS null_specialty
+        FROM dim_provider
+    ) pr
+"""
+
+STATISTICS = [
+    ("Total Patients", "total_patients"),
+    ("Patients with Gender", "with_gender"),
+    ("Patients with Birthdate", "with_birthdate"),
+    ("Total Organizations", "total_orgs"),
+    ("Total Providers", "total_providers"),
+    ("Total Payers", "total_payers"),
+    ("Total Events", "total_events"),
+]
+
+QUALITY_CHECKS = [
+    ("NULL Genders Remaining", "null_gender"),
+    ("NULL Birthdates Remaining", "null_birthdate"),
+    ("NULL Cities (Patients)", "null_patient_city"),
+    ("NULL Cities (Orgs)", "null_org_city"),
+    ("NULL Provider Specialties", "null_specialty"),
+]
+
 def execute_cleaning_script():
     """Execute the cleaning and deduplication script"""
     
@@ -32,8 +86,8 @@ def execute_cleaning_script():
         with open(SQL_FILE, 'r', encoding='utf-8') as f:
             sql_script = f.read()
         
-        # Split into individual statements by semicolon
-        statements = [stmt.strip() for stmt in sql_script.split(';') if stmt.strip()]
+        # Split into individual statements (';' inside strings is kept when sqlparse is installed)
+        statements = [stmt.strip().rstrip(';') for stmt in split_sql_script(sql_script) if stmt.strip()]
         
         print(f"📝 Found {len(statements)} SQL statements to execute\n")
         
@@ -92,26 +146,21 @@ def execute_cleaning_script():
         print(f"   Statements executed: {success_count}/{len(statements)}")
         print(f"   Errors encountered: {error_count}")
         
+        try:
+            cursor.execute(SUMMARY_QUERY)
+            summary = dict(zip(cursor.column_names, cursor.fetchone()))
+        except mysql.connector.Error as e:
+            print(f"\n⚠️  Could not compute statistics: {e}")
+            summary = {}
+        
         # Show statistics
         print("\n📊 Database Statistics After Cleaning:")
         print("-"*70)
         
-        queries = [
-            ("Total Patients", "SELECT COUNT(*) FROM dim_patient"),
-            ("Patients with Gender", "SELECT COUNT(*) FROM dim_patient WHERE gender IS NOT NULL AND gender != ''"),
-            ("Patients with Birthdate", "SELECT COUNT(*) FROM dim_patient WHERE birthdate IS NOT NULL"),
-            ("Total Organizations", "SELECT COUNT(*) FROM dim_organization"),
-            ("Total Providers", "SELECT COUNT(*) FROM dim_provider"),
-            ("Total Payers", "SELECT COUNT(*) FROM dim_payer"),
-            ("Total Events", "SELECT COUNT(*) FROM fact_patient_events"),
-        ]
-        
-        for name, query in queries:
-            try:
-                cursor.execute(query)
-                result = cursor.fetchone()
-                print(f"  {name:.<35} {result[0]:>10,}")
-            except Exception as e:
+        for name, column in STATISTICS:
+            if column in summary:
+                print(f"  {name:.<35} {summary[column]:>10,}")
+            else:
                 print(f"  {name:.<35} {'Error':>10}")
         
         print("-"*70)
@@ -120,25 +169,17 @@ def execute_cleaning_script():
         print("\n🔍 Data Quality Validation:")
         print("-"*70)
         
-        quality_checks = [
-            ("NULL Genders Remaining", "SELECT COUNT(*) FROM dim_patient WHERE gender IS NULL OR gender = ''"),
-            ("NULL Birthdates Remaining", "SELECT COUNT(*) FROM dim_patient WHERE birthdate IS NULL"),
-            ("NULL Cities (Patients)", "SELECT COUNT(*) FROM dim_patient WHERE city IS NULL OR city = ''"),
-            ("NULL Cities (Orgs)", "SELECT COUNT(*) FROM dim_organization WHERE city IS NULL OR city = ''"),
-            ("NULL Provider Specialties", "SELECT COUNT(*) FROM dim_provider WHERE specialty IS NULL OR specialty = ''"),
-        ]
-        
         all_clean = True
-        for name, query in quality_checks:
-            try:
-                cursor.execute(query)
-                result = cursor.fetchone()
-                status = "✅" if result[0] == 0 else "⚠️"
-                if result[0] > 0:
-                    all_clean = False
-                print(f"  {status} {name:.<35} {result[0]:>10,}")
-            except Exception as e:
+        for name, column in QUALITY_CHECKS:
+            if column not in summary:
+                all_clean = False
                 print(f"  ❌ {name:.<35} {'Error':>10}")
+                continue
+            count = summary[column]
+            status = "✅" if count == 0 else "⚠️"
+            if count > 0:
+                all_clean = False
+            print(f"  {status} {name:.<35} {count:>10,}")
         
         print("-"*70)
         
@@ -1,10 +1,16 @@
 import os
+import sys
+import shelve
 import mysql.connector
+from mysql.connector import pooling
 import json
 import re
 import random
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from groq import Groq
+import asyncio
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from collections import defaultdict
+from groq import AsyncGroq
 from dotenv import load_dotenv
 from tqdm import tqdm  
 
@@ -22,7 +28,12 @@ DB_CONFIG = {
 
 # Constants
 BATCH_SIZE = 5000
-MAX_WORKERS = 15  # Number of parallel AI requests
+MAX_WORKERS = int(os.getenv("GROQ_CONCURRENCY", 15))  # Number of parallel AI requests
+NAMES_PER_CALL = 20  # Names requested per AI call (providers sharing a specialty share calls)
+NAME_ROUNDS = 2  # Request rounds per specialty before falling back to "Dr. Unknown"
+TOKENS_PER_NAME = 8  # Completion budget per name ("Dr. First Last" + newline is ~6 tokens)
+NAME_CACHE_FILE = ".llm_name_cache"  # shelve of {specialty: {"names": [...], "used": n}} reused across runs
+REFRESH_NAME_CACHE = "--refresh-llm-cache" in sys.argv
 
 # --- SMART DATA ASSETS ---
 TEXAS_ZIPS_MAP = {
@@ -33,18 +44,103 @@ TEXAS_ZIPS_MAP = {
 }
 TEXAS_ZIPS_FALLBACK = ['75001', '73301', '77001', '78745', '75241', '75551', '76087', '79108']
 
+DIGIT_RE = re.compile(r'\d+')
+
+# Placeholder provider names are built locally from these lists. The LLM is only asked
+# for specialties outside LOCAL_NAME_SPECIALTIES (LLM_NAMES=rare), for all (all) or never (none)
+LLM_NAMES = os.getenv("LLM_NAMES", "rare")
+LOCAL_NAME_SPECIALTIES = {
+    'GENERAL PRACTICE', 'FAMILY PRACTICE', 'INTERNAL MEDICINE', 'PEDIATRICS', 'CARDIOLOGY',
+    'DERMATOLOGY', 'NEUROLOGY', 'ONCOLOGY', 'PSYCHIATRY', 'RADIOLOGY', 'GENERAL SURGERY',
+    'ORTHOPEDIC SURGERY', 'OBSTETRICS/GYNECOLOGY', 'EMERGENCY MEDICINE', 'OPHTHALMOLOGY',
+    'UROLOGY', 'ANESTHESIOLOGY', 'NEPHROLOGY', 'GASTROENTEROLOGY', 'PULMONARY DISEASE'
+}
+FIRST_NAMES = [
+    'James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'William',
+    'Elizabeth', 'David', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah',
+    'Charles', 'Karen', 'Daniel', 'Nancy', 'Matthew', 'Lisa', 'Anthony', 'Margaret', 'Mark',
+    'Sandra', 'Steven', 'Ashley', 'Andrew', 'Emily', 'Joshua', 'Michelle', 'Kevin', 'Laura',
+    'Brian', 'Maria', 'Carlos', 'Ana', 'Luis', 'Sofia', 'Jose', 'Gabriela', 'Omar', 'Priya'
+]
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+    'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor',
+    'Moore', 'Jackson', 'Martin', 'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez',
+    'Clark', 'Ramirez', 'Lewis', 'Robinson', 'Walker', 'Young', 'Allen', 'King', 'Wright',
+    'Scott', 'Torres', 'Nguyen', 'Hill', 'Flores', 'Green', 'Adams', 'Nelson', 'Baker', 'Patel'
+]
+
+# Plain indexes (table, index, columns) covering each enrichment SELECT: the predicates
+# (OR chains with LENGTH and LIKE '%...%') are evaluated on the narrow index instead of
+# scanning the whole table, and the schema keeps only its own columns
+ENRICHMENT_INDEXES = [
+    ("dim_patient", "ix_patient_zip_city", "zip, city"),
+    ("dim_provider", "ix_provider_name_specialty", "name, specialty"),
+]
+# Stored flag columns added by earlier versions of this script, dropped when found
+LEGACY_ENRICHMENT_FLAGS = [("dim_patient", "zip_is_bad"), ("dim_provider", "name_is_placeholder")]
+
 def get_groq_client():
     if not GROQ_API_KEY: return None
-    return Groq(api_key=GROQ_API_KEY)
+    # One client for every request, with a keep-alive pool sized to the concurrency
+    # (httpx keeps only 20 idle connections by default, re-doing TLS above that)
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=MAX_WORKERS, max_keepalive_connections=MAX_WORKERS),
+        timeout=60,
+    )
+    return AsyncGroq(api_key=GROQ_API_KEY, http_client=http_client)
+
+def batch_update(conn, table, key_column, column, updates):
+    """
+    Writes (key, value) pairs as multi-row INSERT ... ON DUPLICATE KEY UPDATE batches:
+    the keys already exist, so each batch is one statement updating BATCH_SIZE rows
+    (executemany of a plain UPDATE sends one statement per row).
+    Not committed here: run_phases commits once per phase.
+    """
+    cursor = conn.cursor()
+    sql = (f"INSERT INTO {table} ({key_column}, {column}) VALUES (%s, %s) "
+           f"ON DUPLICATE KEY UPDATE {column} = VALUES({column})")
+    for i in range(0, len(updates), BATCH_SIZE):
+        cursor.executemany(sql, updates[i:i + BATCH_SIZE])
+
+def ensure_enrichment_indexes(conn):
+    """One-time migration dropping the legacy flag columns and adding the ENRICHMENT_INDEXES (each skipped when done)"""
+    cursor = conn.cursor()
+    for table, column in LEGACY_ENRICHMENT_FLAGS:
+        cursor.execute(f"SHOW COLUMNS FROM {table} LIKE %s", (column,))
+        if cursor.fetchall():
+            print(f"   > Dropping legacy flag column {table}.{column}...")
+            cursor.execute(f"ALTER TABLE {table} DROP COLUMN {column}")
+
+    for table, index, columns in ENRICHMENT_INDEXES:
+        cursor.execute(f"SHOW INDEX FROM {table} WHERE Key_name = %s", (index,))
+        if cursor.fetchall():
+            continue
+        print(f"   > Adding index {table}.{index}...")
+        cursor.execute(f"ALTER TABLE {table} ADD KEY {index} ({columns})")
 
 # ==========================================
 # PHASE 1: REGEX CLEANING (BATCHED)
 # ==========================================
 def clean_names_regex(conn):
     """Removes numbers from Provider names using Batch Updates."""
-    cursor = conn.cursor(dictionary=True)
+    cursor = conn.cursor()
     print("\n🧼 Running Advanced Regex Cleaner (Providers)...")
 
+    # MySQL 8 / MariaDB: strip the digits server-side in one statement
+    try:
+        cursor.execute("""
+            UPDATE dim_provider SET name = TRIM(REGEXP_REPLACE(name, '[0-9]+', ''))
+            WHERE name REGEXP '[0-9]'
+        """)
+        fixed = cursor.rowcount
+        print(f"   > ✅ Fixed {fixed} Provider names.")
+        return
+    except mysql.connector.Error as e:
+        if e.errno != 1305:  # FUNCTION does not exist (MySQL 5.7)
+            raise
+        print("   > REGEXP_REPLACE not available, cleaning in Python...")
+
     # 1. Fetch Data
     cursor.execute("SELECT provider_key, name FROM dim_provider WHERE name REGEXP '[0-9]'")
     providers = cursor.fetchall()
@@ -55,21 +151,15 @@ def clean_names_regex(conn):
 
     # 2. Process in Memory
     updates = []
-    for p in providers:
-        clean_name = re.sub(r'\d+', '', p['name']).strip()
-        if clean_name != p['name']:
-            updates.append((clean_name, p['provider_key']))
+    for provider_key, name in providers:
+        clean_name = DIGIT_RE.sub('', name).strip()
+        if clean_name != name:
+            updates.append((provider_key, clean_name))
 
     # 3. Batch Update
     if updates:
         print(f"   > Batch updating {len(updates)} records...")
-        sql = "UPDATE dim_provider SET name = %s WHERE provider_key = %s"
-        
-        cursor = conn.cursor() # Switch to normal cursor for batching
-        for i in range(0, len(updates), BATCH_SIZE):
-            batch = updates[i:i + BATCH_SIZE]
-            cursor.executemany(sql, batch)
-            conn.commit()
+        batch_update(conn, "dim_provider", "provider_key", "name", updates)
             
     print(f"   > ✅ Fixed {len(updates)} Provider names.")
 
@@ -77,104 +167,174 @@ def clean_names_regex(conn):
 # PHASE 2: SMART ENRICHMENT (PARALLEL & BATCHED)
 # ==========================================
 
-def fetch_ai_name(client, specialty):
-    """Worker function for threading"""
-    prompt = f"Generate a realistic doctor name (e.g. Dr. John Smith) for a specialist in {specialty}. Output ONLY the name. Do not use 'Sample' or single letters."
+def clean_ai_name(raw):
+    """Normalises one generated line to the 'Dr. First Last' form"""
+    name = raw.strip().lstrip('-*0123456789.) ').replace('"', '').replace('.', '')
+    if not name: return None
+    if "Dr" not in name: name = f"Dr. {name}"
+    if name.startswith("Dr") and not name.startswith("Dr."): name = name.replace("Dr", "Dr.")
+    return name
+
+async def fetch_ai_names(client, semaphore, specialty, count):
+    """Async worker: one request for `count` distinct names, the semaphore caps requests in flight"""
+    prompt = f"{count} distinct realistic {specialty} doctor names, one per line, format 'Dr. First Last', nothing else."
     try:
-        resp = client.chat.completions.create(
-            model=AI_MODEL,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.9,
-            max_tokens=20
-        )
-        name = resp.choices[0].message.content.strip().replace('"', '').replace('.', '')
-        
-        # Cleaning
-        if "Dr" not in name: name = f"Dr. {name}"
-        if name.startswith("Dr") and not name.startswith("Dr."): name = name.replace("Dr", "Dr.")
-        return name
-    except:
-        return "Dr. Unknown"
-
-def run_smart_enrichment(conn):
-    client = get_groq_client()
-    cursor = conn.cursor(dictionary=True)
-    print("\n🧠 Starting Smart Data Enrichment...")
+        async with semaphore:
+            resp = await client.chat.completions.create(
+                model=AI_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.9,
+                max_tokens=TOKENS_PER_NAME * count
+            )
+        lines = resp.choices[0].message.content.splitlines()
+        if resp.choices[0].finish_reason == "length":
+            lines = lines[:-1]  # last name cut off by the token cap, the next round refills it
+        names = [clean_ai_name(line) for line in lines]
+        return [name for name in names if name][:count]
+    except Exception:
+        return []
+
+async def generate_provider_names(client, providers, name_cache):
+    """
+    Names providers per specialty (not per provider), handing out the cached names no
+    earlier run has assigned yet before asking the LLM, and returns (provider_key, name) updates
+    """
+    semaphore = asyncio.Semaphore(MAX_WORKERS)
+    keys_by_specialty = defaultdict(list)
+    for provider_key, specialty in providers:
+        keys_by_specialty[specialty].append(provider_key)
+
+    with tqdm(total=len(providers), desc="   🤖 AI Generation") as pbar:
+        async def names_for(specialty, provider_keys):
+            entry = name_cache.get(str(specialty), {"names": [], "used": 0})
+            cached, used = entry["names"], entry["used"]
+            pool = cached[used:]  # names no earlier run has handed out
+            for _ in range(NAME_ROUNDS):
+                missing = len(provider_keys) - len(pool)
+                if missing <= 0: break
+                # Whole NAMES_PER_CALL requests: the surplus is kept for the next runs
+                calls = -(-missing // NAMES_PER_CALL)
+                for names in await asyncio.gather(*(fetch_ai_names(client, semaphore, specialty, NAMES_PER_CALL) for _ in range(calls))):
+                    pool.extend(names)
+
+            assigned = pool[:len(provider_keys)]
+            pbar.update(len(assigned))
+            # Assigned names are never handed out again, the unused tail serves later runs
+            name_cache[str(specialty)] = {"names": cached[:used] + pool, "used": used + len(assigned)}
+
+            # Providers left without a name keep the placeholder and are retried on the next run
+            pool = assigned + ["Dr. Unknown"] * (len(provider_keys) - len(assigned))
+            return list(zip(provider_keys, pool))
+
+        results = await asyncio.gather(*(names_for(s, keys) for s, keys in keys_by_specialty.items()))
+    await client.close()
+
+    return [update for updates in results for update in updates]
+
+def enrich_zip_codes(conn):
+    print("\n🧠 Starting Smart Data Enrichment (ZIP codes)...")
 
     # --- A. ZIP CODES (BATCHED) ---
     sql_missing_zips = """
-        SELECT patient_key, city 
+        SELECT patient_key, UPPER(city) 
         FROM dim_patient 
         WHERE zip IS NULL OR zip = '' OR zip = '0' OR LENGTH(zip) < 5
     """
-    cursor.execute(sql_missing_zips)
-    patients = cursor.fetchall()
-
-    if patients:
-        print(f"   ... Processing {len(patients)} missing ZIP codes...")
-        zip_updates = []
-        for p in patients:
-            city_key = p['city'].upper() if p['city'] else ''
-            new_zip = TEXAS_ZIPS_MAP.get(city_key, random.choice(TEXAS_ZIPS_FALLBACK))
-            zip_updates.append((new_zip, p['patient_key']))
-        
-        # Batch Update
-        sql_update = "UPDATE dim_patient SET zip = %s WHERE patient_key = %s"
-        cursor = conn.cursor()
-        for i in tqdm(range(0, len(zip_updates), BATCH_SIZE), desc="   💾 Updating Zips"):
-            batch = zip_updates[i:i + BATCH_SIZE]
-            cursor.executemany(sql_update, batch)
-            conn.commit()
+    # Stream the rows with an unbuffered cursor on a second connection while `conn` writes,
+    # so only one batch of patients is held in memory at a time
+    read_conn = mysql.connector.connect(**DB_CONFIG)
+    total = 0
+    try:
+        read_cursor = read_conn.cursor(buffered=False)
+        read_cursor.execute(sql_missing_zips)
+
+        with tqdm(desc="   💾 Updating Zips", unit=" rows") as pbar:
+            while True:
+                patients = read_cursor.fetchmany(BATCH_SIZE)
+                if not patients: break
+
+                # Draw every fallback ZIP of the batch in one call instead of one random.choice per patient
+                fallback_zips = random.choices(TEXAS_ZIPS_FALLBACK, k=len(patients))
+                # Cities come back upper-cased (NULL stays None and gets the fallback)
+                zip_updates = [
+                    (patient_key, TEXAS_ZIPS_MAP.get(city, fallback_zip))
+                    for (patient_key, city), fallback_zip in zip(patients, fallback_zips)
+                ]
+
+                # Batch Update
+                batch_update(conn, "dim_patient", "patient_key", "zip", zip_updates)
+                total += len(patients)
+                pbar.update(len(patients))
+    finally:
+        read_conn.close()
+
+    if total:
+        print(f"   > ✅ Filled {total} missing ZIP codes.")
     else:
         print("   > Zip codes appear fully populated.")
 
-    # --- B. PROVIDER NAMES (PARALLEL LLM) ---
-    if client:
-        cursor = conn.cursor(dictionary=True)
-        sql_provider_fix = """
-            SELECT provider_key, specialty 
-            FROM dim_provider 
-            WHERE name IS NULL OR name = '' OR name LIKE '%Unknown%' 
-               OR name IN ('Dr. XYZ', 'Dr. ABC', 'Dr. X', 'Dr. W', 'Dr. Sample Doctor')
-        """
-        cursor.execute(sql_provider_fix)
-        providers = cursor.fetchall()
-
-        if providers:
-            print(f"   ... Generating Names for {len(providers)} Providers (Parallel Mode)...")
-            
-            name_updates = []
-            
-            # THREADING: Run API calls in parallel
-            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                # Map futures to provider keys
-                future_to_key = {executor.submit(fetch_ai_name, client, p['specialty']): p['provider_key'] for p in providers}
-                
-                for future in tqdm(as_completed(future_to_key), total=len(providers), desc="   🤖 AI Generation"):
-                    prov_key = future_to_key[future]
-                    try:
-                        new_name = future.result()
-                        name_updates.append((new_name, prov_key))
-                    except Exception as exc:
-                        pass
-
-            # Batch Update Database
-            print("   💾 Saving generated names...")
-            sql_update = "UPDATE dim_provider SET name = %s WHERE provider_key = %s"
-            cursor = conn.cursor()
-            cursor.executemany(sql_update, name_updates)
-            conn.commit()
-            print(f"   > ✅ Updated {len(name_updates)} provider names.")
-        else:
-            print("   > No provider names needed fixing.")
+def local_provider_name(provider_key):
+    """
+    Deterministic 'Dr. First Last' name for a provider_key, no API call. Consecutive keys
+    walk every first/last pair before one repeats, then a middle initial is added, so
+    names are distinct for every provider_key below len(FIRST_NAMES) * len(LAST_NAMES) * 27.
+    """
+    rest, first = divmod(provider_key, len(FIRST_NAMES))
+    cycle, last = divmod(rest, len(LAST_NAMES))
+    middle = f" {chr(ord('A') + (cycle - 1) % 26)}." if cycle else ""
+    return f"Dr. {FIRST_NAMES[first]}{middle} {LAST_NAMES[last]}"
+
+def local_provider_names(providers):
+    """Local names for (provider_key, specialty) rows, the same on every run"""
+    return [(provider_key, local_provider_name(provider_key)) for provider_key, _ in providers]
+
+def enrich_provider_names(conn):
+    cursor = conn.cursor()
+    print("\n🧠 Starting Smart Data Enrichment (Provider names)...")
+
+    # --- B. PROVIDER NAMES (LOCAL + PARALLEL LLM) ---
+    sql_provider_fix = """
+        SELECT provider_key, specialty 
+        FROM dim_provider 
+        WHERE name IS NULL OR name = '' OR name LIKE '%Unknown%' 
+           OR name IN ('Dr. XYZ', 'Dr. ABC', 'Dr. X', 'Dr. W', 'Dr. Sample Doctor')
+    """
+    cursor.execute(sql_provider_fix)
+    providers = cursor.fetchall()
+
+    if not providers:
+        print("   > No provider names needed fixing.")
+        return
+
+    if not GROQ_API_KEY or LLM_NAMES == "none":
+        llm_providers = []
+        reason = "LLM_NAMES=none" if GROQ_API_KEY else "no GROQ_API_KEY found"
+        print(f"   ⚠️ No LLM for names ({reason}): every placeholder gets a local name derived from its provider_key.")
+    elif LLM_NAMES == "all":
+        llm_providers = providers
     else:
-        print("   > Skipping LLM generation (No API Key found).")
+        llm_providers = [p for p in providers if (p[1] or '').upper() not in LOCAL_NAME_SPECIALTIES]
+
+    llm_keys = {provider_key for provider_key, _ in llm_providers}
+    name_updates = local_provider_names([p for p in providers if p[0] not in llm_keys])
+    print(f"   ... Generated {len(name_updates)} provider names locally (deterministic, from FIRST_NAMES/LAST_NAMES)...")
+
+    if llm_providers:
+        print(f"   ... Generating Names for {len(llm_providers)} Providers (Parallel Mode)...")
+        with shelve.open(NAME_CACHE_FILE) as name_cache:
+            if REFRESH_NAME_CACHE:
+                name_cache.clear()
+            name_updates += asyncio.run(generate_provider_names(get_groq_client(), llm_providers, name_cache))
+
+    # Batch Update Database
+    print("   💾 Saving generated names...")
+    batch_update(conn, "dim_provider", "provider_key", "name", name_updates)
+    print(f"   > ✅ Updated {len(name_updates)} provider names.")
 
 # ==========================================
 # PHASE 3: LOGICAL VALIDATION (UNCHANGED)
 # ==========================================
-def perform_advanced_validation(conn):
-    cursor = conn.cursor()
+def perform_advanced_validation(pool):
     print("\n" + "="*60)
     print("🔍 ADVANCED LOGICAL VALIDATION REPORT")
     print("="*60)
@@ -182,28 +342,64 @@ def perform_advanced_validation(conn):
     validations = [
         {"name": "Birthdate in Future", "query": "SELECT COUNT(*) FROM dim_patient WHERE birthdate > CURDATE()"},
         {"name": "Event Before Birth", "query": "SELECT COUNT(*) FROM fact_patient_events f JOIN dim_patient p ON f.patient_key = p.patient_key WHERE f.date_key < p.birthdate"},
-        {"name": "Invalid Zip Format", "query": "SELECT COUNT(*) FROM dim_patient WHERE zip NOT REGEXP '^[0-9]{5}$'"}
+        # Exactly 5 digits, without the regex engine: a 5-char string is all digits
+        # iff it survives an integer round-trip (zero-padded back to 5 chars)
+        {"name": "Invalid Zip Format", "query": "SELECT COUNT(*) FROM dim_patient WHERE LENGTH(zip) != 5 OR LPAD(CAST(zip AS UNSIGNED), 5, '0') != zip"}
     ]
 
-    for v in validations:
-        cursor.execute(v['query'])
-        count = cursor.fetchone()[0]
+    # All checks as scalar subqueries of one SELECT: a single round trip, one result row
+    sql = "SELECT " + ", ".join(f"({v['query']})" for v in validations)
+    conn = pool.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql)
+        counts = cursor.fetchone()
+    finally:
+        conn.close()
+
+    for v, count in zip(validations, counts):
         status = "✅ PASS" if count == 0 else f"❌ FAIL ({count})"
         print(f"{status:<20} : {v['name']}")
 
 # ==========================================
 # MAIN
 # ==========================================
+def run_phases(pool, *phases):
+    """Runs phases in order on one pooled connection, each as a single transaction"""
+    conn = pool.get_connection()
+    try:
+        for phase in phases:
+            try:
+                phase(conn)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+    finally:
+        conn.close()  # returns the connection to the pool
+
 def clean_and_validate():
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        clean_names_regex(conn)
-        run_smart_enrichment(conn)
-        perform_advanced_validation(conn)
+        pool = pooling.MySQLConnectionPool(
+            pool_name="enrich", pool_size=2, pool_reset_session=False, **DB_CONFIG
+        )
+
+        run_phases(pool, ensure_enrichment_indexes)
+
+        # Provider cleaning/naming and ZIP enrichment touch different tables: run them
+        # side by side. Names are generated after the digit strip, which can empty a name.
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [
+                executor.submit(run_phases, pool, clean_names_regex, enrich_provider_names),
+                executor.submit(run_phases, pool, enrich_zip_codes),
+            ]
+            for future in futures:
+                future.result()
+
+        # Validation reads the enriched data, so it runs last
+        perform_advanced_validation(pool)
     except Exception as e:
         print(f"❌ Error: {e}")
-    finally:
-        if 'conn' in locals() and conn.is_connected(): conn.close()
 
 if __name__ == "__main__":
     clean_and_validate()
\ No newline at end of file